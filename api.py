@@ -1,167 +1,421 @@
-from openai import OpenAI
+import asyncio
+import os
 import time
-import requests
 from datetime import datetime
-import tkinter as tk
+from monitor import LatencyMonitor
+from fences import FenceParser
+from clients import ClientRegistry
+from scheduler import RequestScheduler
+from engine import StreamEngine
+from tokens import counter_for, cost, MESSAGE_OVERHEAD
+from budget import fit_history
+from compaction import Compactor
+from cache import ResponseCache, CachedStream, cache_key, cached_completion
+from retrieval import Retriever
+from conversation import Message
+from router import Router
+from telemetry import RequestTrace, Telemetry
+import debug
+
+class ChatRequest:
+    """One queued message plus the settings it is sent with, captured on the Tk thread."""
+    __slots__ = ("user_text", "model", "streaming", "system_prompt", "base_url", "api_key", "model_config", "trace")
+
+    def __init__(self, user_text, model, streaming, system_prompt, base_url, api_key, model_config):
+        self.user_text = user_text
+        self.model = model
+        self.streaming = streaming
+        self.system_prompt = system_prompt
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model_config = model_config  # available_models entry: pricing, tokenizer, ...
+        self.trace = None  # RequestTrace, once the request is sent
 
-DEBUG_MODE = False  # Global debug toggle
 
 class APIHandler:
     def __init__(self, gui):
         self.gui = gui
+        debug.state.configure(self.gui.config)
+        self.engine = StreamEngine(max_streams=self.gui.config.max_concurrent_streams)
+        self.clients = ClientRegistry()
+        self.scheduler = RequestScheduler(self.engine, self.process_request)
+        self.compactor = Compactor(self.clients, self.gui.config)
+        config = self.gui.config
+        self.response_cache = ResponseCache(
+            config.response_cache_path, config.response_cache_ttl_hours, config.response_cache_max_mb
+        ) if config.response_cache_enabled else None
+        self.retriever = Retriever(config)
+        self.fence_parser = FenceParser()
+        self.code_block = None  # [mark, code parts, lang] of the fenced block being streamed
+        self.latency_monitor = LatencyMonitor(
+            min_interval=self.gui.config.ping_interval_min,
+            max_interval=self.gui.config.ping_interval_max
+        )
+        self.latency_monitor.start(self.engine)
+        self.router = Router(self.latency_monitor, config)
+        self.telemetry = Telemetry(config.telemetry_capacity)
         self.log("APIHandler initialized")
 
-    def log(self, message):
-        if DEBUG_MODE:
-            print(f"[DEBUG API]: {message}")
+    def log(self, message, *args):
+        """Debug line; message % args is only formatted when debug logging is on."""
+        if debug.state.logging:
+            print("[DEBUG API]: " + (message % args if args else message))
 
     def get_ping_time(self):
-        try:
-            start_time = time.time()
-            base_url = self.gui.config.get_base_url()
-            self.log(f"Pinging base URL: {base_url}")
-            response = requests.get(base_url, timeout=5)
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            ping_ms = (time.time() - start_time) * 1000
-            ping_str = f"{ping_ms:.0f}ms"
-            self.log(f"Ping time: {ping_str}")
-            return ping_str
-        except requests.exceptions.RequestException as e:
-            self.log(f"Ping error: {e}")
-            return "N/A"
-        except Exception as e:
-            self.log(f"Unexpected ping error: {e}") #More general error
-            return "N/A"
+        """Format the latest latency stats; never blocks on the network."""
+        stats = self.latency_monitor.snapshot()
+        if stats["p50"] is None:
+            return f"ERR {stats['error']}" if stats["error"] else "N/A"
+        ping_str = f"p50 {stats['p50']:.0f}ms p95 {stats['p95']:.0f}ms"
+        if stats["error"]:
+            ping_str += f" ERR {stats['error']}"
+        return ping_str
+
+    def watch_endpoints(self):
+        """Probe the selected model's endpoint, and those it can fail over to."""
+        config = self.gui.config
+        alternates = self.router.group(config.get_model_config())[1:]
+        self.latency_monitor.watch(config.get_base_url(), [model["base_url"] for model in alternates])
+
+    def warm_up(self):
+        """Pre-connect to the selected model's endpoint."""
+        config = self.gui.config
+        self.engine.call_soon(self.clients.sync, config.available_models)
+        self.engine.submit(self.clients.warm_up(config.get_base_url(), config.get_api_key()))
 
     def get_current_time(self):
         current_time = datetime.now().strftime("%H:%M:%S")
-        self.log(f"Current time: {current_time}")
+        self.log("Current time: %s", current_time)
         return current_time
 
-    def get_chat_history(self):
-        """Extract conversation history from chat_display."""
-        self.log("Extracting chat history")
-        history = [{"role": "system", "content": self.gui.config.system_prompt.get()}]
-        chat_content = self.gui.chat_display.get(1.0, tk.END).strip()
-        if not chat_content:
-            self.log("Chat content is empty, returning only system prompt.")
-            return history
-        lines = chat_content.split("\n")
-        current_role = None
-        current_message = []
-        for line in lines:
-            if line.startswith(">: "):  # User message
-                if current_message and current_role:
-                    history.append({"role": current_role, "content": "\n".join(current_message).strip()})
-                current_role = "user"
-                current_message = [line[3:]]  # Remove ">: "
-            elif line.startswith("ERROR: "):  # Skip errors
-                continue
-            else:  # Assistant message or continuation
-                if current_role is None and line.strip():
-                    current_role = "assistant"
-                    current_message = [line]
-                elif current_role:
-                    current_message.append(line)
-        if current_message and current_role:
-            history.append({"role": current_role, "content": "\n".join(current_message).strip()})
-        self.log(f"Extracted chat history: {history}")
-        return history
-
-    def process_request(self, user_text):
+    async def retrieve_context(self, request, counter):
+        """Excerpts of the open folder relevant to the message, within retrieval_max_tokens."""
+        config = self.gui.config
+        self.gui.retrieved_chunks = 0
+        if not config.retrieval_enabled or not self.retriever.active:
+            return ""
+        chunks = await self.retriever.query(request.user_text, config.retrieval_top_k)
+        root = self.gui.current_directory or ""
+        blocks, used = [], 0
+        for chunk in chunks:
+            block = f"--- {os.path.relpath(chunk.path, root)} (lines {chunk.start}-{chunk.end}) ---\n{chunk.text}"
+            tokens = counter.count(block)
+            if used + tokens > config.retrieval_max_tokens:
+                continue  # A smaller, lower-ranked chunk may still fit
+            blocks.append(block)
+            used += tokens
+        self.gui.retrieved_chunks = len(blocks)
+        self.log("Retrieved %d of %d chunks, %d tokens", len(blocks), len(chunks), used)
+        if not blocks:
+            return ""
+        return "\n\nExcerpts from the user's open project folder that may be relevant:\n" + "\n\n".join(blocks)
+
+    def plan_history(self, request, counter, system_prompt):
+        """Pick the messages that fit the model's context window and size max_tokens to what is left."""
+        conversation = self.gui.conversation
+        total = conversation.token_total(counter)
+        messages, payload = conversation.history()
+        plan = fit_history(
+            messages, system_prompt, counter, request.model_config, total,
+            self.compactor.summary, payload
+        )
+        self.log("Sending %d messages, %d tokens, max_tokens %d, %d turns trimmed",
+                 len(plan.messages), plan.input_tokens, plan.max_tokens, len(plan.dropped))
+        return plan
+
+    def submit(self, user_text):
+        """Queue a user message; it is shown and sent once earlier requests finish."""
+        ahead = self.scheduler.pending + self.scheduler.busy  # Requests ahead of this one
+        config = self.gui.config
+        # Tk variables are read here, on the Tk thread; the loop only sees plain values
+        self.scheduler.submit(ChatRequest(
+            user_text, config.model.get(), config.streaming.get(), config.system_prompt.get(),
+            config.get_base_url(), config.get_api_key(), config.get_model_config()
+        ))
+        return ahead
+
+    def reset(self):
+        """Forget per-chat state kept on the loop (the chat was cleared)."""
+        self.engine.call_soon(self.compactor.reset)
+
+    def clear(self, session_id, done):
+        """Start a new chat under session_id once the reply in flight, if any, has unwound.
+
+        Everything the cancelled reply commits or displays lands before the
+        clear, and messages sent afterwards after it; done() then runs on the
+        Tk thread, behind whatever the old reply posted.
+        """
+        def clear():
+            self.compactor.reset()
+            self.gui.conversation.clear()
+            self.gui.session_id = session_id
+            self.ui(done)
+        self.scheduler.reset(clear)
+
+    def cancel(self, drop_queued=False):
+        """Stop the reply being streamed. Cancelling the task closes the HTTP response, ending generation (and billing)."""
+        if drop_queued:
+            self.scheduler.cancel_all()
+        else:
+            self.scheduler.cancel()
+
+    def ui(self, fn, *args):
+        """Run fn(*args) on the Tk thread, in order with everything else posted."""
+        self.engine.post(fn, *args)
+
+    def display(self, text, tag=None):
+        self.engine.post(self.gui.update_display, text, tag)
+
+    async def process_request(self, request):
+        with debug.profile_request(request.user_text[:80]):
+            await self.run_request(request)
+        if debug.state.spans:
+            print(f"[TRACE API]: {debug.tracer.report()}")
+
+    async def run_request(self, request):
         self.log("Starting process_request")
+        self.gui.active_request = True
+        message = self.gui.conversation.add("user", request.user_text)
+        self.ui(self.gui.renderer.mark, f"msg{message.seq}")  # Search jumps to messages by these marks
+        self.display(f"\n>: {request.user_text}\n", "user")
+        self.ui(self.gui.manage_thinking_animation, "start")
         try:
-            api_key = self.gui.config.get_api_key()
-            base_url = self.gui.config.get_base_url()
-            self.log(f"API Key: {api_key[:4]}...{api_key[-4:] if api_key else ''}, Base URL: {base_url}") #Sanitize for logging
+            api_key, base_url = request.api_key, request.base_url
+            self.log("API Key: %s...%s, Base URL: %s", api_key[:4], api_key[-4:] if api_key else "", base_url) #Sanitize for logging
             if not api_key or not base_url:
                 raise ValueError("Invalid API key or base URL for selected model")
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            messages = self.get_chat_history()
-            if user_text.strip():
-                messages.append({"role": "user", "content": user_text})
-            self.gui.input_tokens = sum(len(m["content"].split()) for m in messages)
-            self.log(f"Input tokens: {self.gui.input_tokens}")
+            self.clients.sync(self.gui.config.available_models)
+            self.gui.route_note = ""
+            with debug.tracer.span("build"):
+                counter = counter_for(request.model_config)
+                system_prompt = request.system_prompt + await self.retrieve_context(request, counter)
+                plan = self.plan_history(request, counter, system_prompt)  # user_text was already recorded above
+            self.gui.input_tokens = plan.input_tokens  # Replaced by the API's own count if it reports usage
+            self.gui.trimmed_messages = sum(len(turn) for turn in plan.dropped)
+            self.gui.summarised_messages = self.compactor.summary.covered if self.compactor.summary else 0
+            self.log("Input tokens: %d", self.gui.input_tokens)
             self.gui.stream_start_time = time.time()
-            self.log(f"StreamStartTime: {self.gui.stream_start_time}")
-            response = client.chat.completions.create(
-                model=self.gui.config.model.get(),
-                messages=messages,
-                stream=self.gui.config.streaming.get(),
-                max_tokens=8096
-            )
-            self.log("API call successful, handling response")
-            self.handle_response(response)
+            self.log("StreamStartTime: %s", self.gui.stream_start_time)
+            request.trace = RequestTrace(request.model, request.base_url)
+            key = cache_key(request.model, plan.messages) if self.response_cache else None
+            cached = await self.response_cache.get(key) if key else None
+            if cached is not None:
+                self.log("Response cache hit, replaying")
+                request.trace.cached = True
+                request.trace.connected(request.model, request.base_url, 0)
+                response = CachedStream(cached) if request.streaming else cached_completion(cached)
+                await self.handle_response(response, request, counter, cached=True)
+            else:
+                async with self.engine.streams:
+                    extra = {"stream_options": {"include_usage": True}} if request.streaming else {}
+                    with debug.tracer.span("network"):
+                        response = await self.router.open(
+                            self.clients, request, lambda text: self.ui(self.gui.show_route, text),
+                            messages=plan.messages,
+                            stream=request.streaming,
+                            max_tokens=plan.max_tokens,
+                            **extra
+                        )
+                    self.log("API call successful, handling response")
+                    reply = await self.handle_response(response, request, counter)
+                if key and reply is not None and reply.content.strip():
+                    await self.response_cache.put(key, reply.content)
+            self.compactor.maybe_compact(self.gui.conversation, counter)  # Runs alongside the next request
+        except asyncio.CancelledError:
+            self.log("Request cancelled")
+            if request.trace is not None:
+                request.trace.outcome = "cancelled"
         except Exception as e:
-            self.log(f"Error in process_request: {str(e)}")
-            self.gui.show_error(f"API Error: {str(e)}")
-            self.gui.active_request = False
-            self.gui.manage_thinking_animation("stop")
-            return
+            self.log("Error in process_request: %s", e)
+            self.ui(self.gui.show_error, f"API Error: {str(e)}")
+            if request.trace is not None:
+                request.trace.outcome = "error"
         finally:
             self.log("Executing finally block in process_request")
+            if request.trace is not None:
+                request.trace.finish()
+                self.telemetry.record(request.trace)
             self.gui.active_request = False
-            self.gui.manage_thinking_animation("stop")
+            self.ui(self.gui.manage_thinking_animation, "stop")
 
-    def handle_response(self, response):
+    async def handle_response(self, response, request, counter, cached=False):
             self.log("Starting handle_response")
-            self.log(f"parse_and_display_content available: {hasattr(self, 'parse_and_display_content')}")
-            self.gui.current_response = ""
-            self.gui.update_display("\n> ", "assistant")
+            streaming_enabled = request.streaming
+            usage = None
+            reply = self.gui.conversation.begin("assistant")
+            self.ui(self.gui.renderer.mark, f"msg{reply.seq}")
+            self.fence_parser = FenceParser()  # Fresh state so an unclosed fence can't leak into the next reply
+            self.display("\n> ", "assistant")
             try:
-                streaming_enabled = self.gui.config.streaming.get()
-                self.log(f"Streaming Enabled: {streaming_enabled}")
+                self.log("Streaming Enabled: %s", streaming_enabled)
                 if streaming_enabled:
                     self.log("Handling streaming response")
-                    total_characters = 0  # Initialize character counter
-                    for chunk in response:
-                        content = chunk.choices[0].delta.content or ""
-                        self.gui.current_response += content
-                        self.parse_and_display_content(content)
-                        total_characters += len(content) #Increment character counter inside
-                    self.gui.output_tokens = total_characters / 4 #Character counter divided by 4
+                    try:
+                        async for chunk in response:
+                            if chunk.usage:
+                                usage = chunk.usage  # Final chunk when include_usage is honoured
+                            if not chunk.choices:
+                                continue
+                            content = chunk.choices[0].delta.content or ""
+                            self.gui.conversation.extend(reply, content)
+                            self.parse_and_display_content(content)
+                            if content:
+                                self.trace_chunk(request.trace)
+                            await self.engine.drain()  # Don't outrun the UI
+                    finally:
+                        await response.close()  # Also on cancel: closing the response stops generation
                 else:
                     self.log("Handling non-streaming response")
-                    full_response = response.choices[0].message.content
-                    self.gui.current_response = full_response
+                    full_response = response.choices[0].message.content or ""
+                    usage = response.usage
+                    self.gui.conversation.extend(reply, full_response)
                     self.parse_and_display_content(full_response)
-                    self.gui.output_tokens = len(full_response) / 4
-                self.gui.output_tokens = int(self.gui.output_tokens) #Convert to integer for ease of use
-                self.log(f"Output tokens: {self.gui.output_tokens}")
-                self.gui.update_status()
+                    self.trace_chunk(request.trace)
+                self.display_segments(self.fence_parser.close())
+                self.finish_code_block()  # Reply ended inside an unclosed fence
                 self.log("Completed handle_response successfully")
+                return reply
+            except asyncio.CancelledError:
+                self.display_segments(self.fence_parser.close())
+                self.finish_code_block()
+                self.display("\n[cancelled]\n", "error")
+                raise
             except Exception as e:
-                self.log(f"Error in handle_response: {str(e)}")
-                self.gui.show_error(f"Response Error: {str(e)}")
-                self.gui.active_request = False
-                self.gui.manage_thinking_animation("stop")
+                self.log("Error in handle_response: %s", e)
+                self.ui(self.gui.show_error, f"Response Error: {str(e)}")
                 raise
+            finally:
+                request.trace.finish()
+                committed = self.gui.conversation.finish(reply)  # Keep whatever was shown, even on error
+                self.record_usage(request, counter, committed, usage, cached)
+
+    def fan_out(self, user_text, model_names, view):
+        """Send the chat so far plus user_text to several models at once (comparison mode).
+
+        Runs beside the scheduler rather than in its queue, so the streams are
+        concurrent and the wall time is that of the slowest model. Replies go to
+        view, not to the conversation. Returns the future of the whole fan-out.
+        """
+        config = self.gui.config
+        requests = [
+            ChatRequest(user_text, model["name"], True, config.system_prompt.get(),
+                        model["base_url"], model["api_key"], model)
+            for model in config.available_models if model["name"] in model_names
+        ]
+        if len(requests) > config.max_concurrent_streams:
+            self.log("Comparing %d models with %d streams; some will wait", len(requests), config.max_concurrent_streams)
+        return self.engine.submit(self.compare(requests, view))
+
+    async def compare(self, requests, view):
+        self.clients.sync(self.gui.config.available_models)
+        start = time.perf_counter()
+        await asyncio.gather(*(self.compare_one(request, view, start) for request in requests))
+        self.ui(view.finished, time.perf_counter() - start)
+
+    async def compare_one(self, request, view, start):
+        """Stream one model's reply into its pane and report TTFT, tokens/s and latency from start."""
+        name = request.model
+        try:
+            if not request.api_key or not request.base_url:
+                raise ValueError("Invalid API key or base URL for this model")
+            client = self.clients.get(request.base_url, request.api_key)
+            counter = counter_for(request.model_config)
+            system_prompt = request.system_prompt + await self.retrieve_context(request, counter)
+            plan = fit_history(
+                self.gui.conversation.snapshot() + [Message("user", request.user_text)], system_prompt,
+                counter, request.model_config, summary=self.compactor.summary
+            )
+            parser = FenceParser()
+            parts, usage, first = [], None, None
+            async with self.engine.streams:
+                response = await client.chat.completions.create(
+                    model=request.model,
+                    messages=plan.messages,
+                    stream=True,
+                    max_tokens=plan.max_tokens,
+                    stream_options={"include_usage": True}
+                )
+                try:
+                    async for chunk in response:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        content = chunk.choices[0].delta.content or ""
+                        if content and first is None:
+                            first = time.perf_counter()
+                        parts.append(content)
+                        self.compare_segments(view, name, parser.feed(content))
+                        await self.engine.drain()
+                finally:
+                    await response.close()
+            end = time.perf_counter()
+            self.compare_segments(view, name, parser.close())
+            reply = "".join(parts)
+            tokens = usage.completion_tokens if usage and usage.completion_tokens else counter.count(reply)
+            first = first or end
+            rate = tokens / (end - first) if end > first else 0.0
+            self.log("%s: TTFT %.2fs, %.1f tok/s, %.2fs", name, first - start, rate, end - start)
+            self.ui(view.set_stats, name, first - start, rate, end - start, tokens, reply)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log("Error comparing %s: %s", name, e)
+            self.ui(view.fail, name, str(e))
+
+    def compare_segments(self, view, name, segments):
+        for segment in segments:
+            if segment.kind in ("text", "code"):
+                self.ui(view.write, name, segment.text, "code" if segment.kind == "code" else "assistant")
+
+    def record_usage(self, request, counter, reply, usage, cached=False):
+        """Settle the token counts and cost of a reply, preferring the numbers the API reports."""
+        output_tokens = counter.count_message(reply) - MESSAGE_OVERHEAD if reply else 0
+        if usage is not None:
+            if usage.prompt_tokens:
+                self.gui.input_tokens = usage.prompt_tokens
+            if usage.completion_tokens:
+                details = getattr(usage, "completion_tokens_details", None)
+                reasoning = getattr(details, "reasoning_tokens", None) or 0  # Billed, but not in the reply text
+                if reply:
+                    counter.calibrate(reply.content, usage.completion_tokens - reasoning)
+                output_tokens = usage.completion_tokens
+        self.gui.output_tokens = output_tokens
+        request.trace.input_tokens, request.trace.output_tokens = self.gui.input_tokens, output_tokens
+        self.gui.last_trace = request.trace
+        self.gui.request_cost = 0.0 if cached else cost(request.model_config, self.gui.input_tokens, output_tokens)
+        if self.response_cache:
+            self.gui.cache_stats = (self.response_cache.hits, self.response_cache.lookups)
+        self.gui.session_cost += self.gui.request_cost
+        self.log("Tokens: %d in / %d out, $%.6f", self.gui.input_tokens, output_tokens, self.gui.request_cost)
+        self.ui(self.gui.update_status)
+
+    def trace_chunk(self, trace):
+        """Time a chunk's arrival; at most one per frame is followed through to the screen."""
+        arrived = trace.chunk()
+        if not trace.awaiting_render:
+            trace.awaiting_render = True
+            self.ui(self.gui.renderer.call, trace.rendered, arrived)  # Runs once the text before it is drawn
 
     def parse_and_display_content(self, content):
-        self.log("Entering parse_and_display_content")
-        self.gui.code_parse_buffer += content
-        while True:
-            if self.gui.in_code_block:
-                end_idx = self.gui.code_parse_buffer.find('```')
-                if end_idx == -1:
-                    self.log("In code block, end not found, displaying buffer")
-                    self.gui.root.after(0, self.gui.update_display, self.gui.code_parse_buffer, "code")
-                    self.gui.code_parse_buffer = ""
-                    break
-                else:
-                    self.log("In code block, end found, displaying code")
-                    self.gui.root.after(0, self.gui.update_display, self.gui.code_parse_buffer[:end_idx], "code")
-                    self.gui.code_parse_buffer = self.gui.code_parse_buffer[end_idx+3:]
-                    self.gui.in_code_block = False
-            else:
-                start_idx = self.gui.code_parse_buffer.find('```')
-                if start_idx == -1:
-                    self.log("Not in code block, start not found, displaying assistant text")
-                    self.gui.root.after(0, self.gui.update_display, self.gui.code_parse_buffer, "assistant")
-                    self.gui.code_parse_buffer = ""
-                    break
-                else:
-                    self.log("Not in code block, start found, displaying assistant text")
-                    self.gui.root.after(0, self.gui.update_display, self.gui.code_parse_buffer[:start_idx], "assistant")
-                    self.gui.code_parse_buffer = self.gui.code_parse_buffer[start_idx+3:]
-                    self.gui.in_code_block = True
\ No newline at end of file
+        with debug.tracer.span("parse"):
+            self.display_segments(self.fence_parser.feed(content))
+
+    def display_segments(self, segments):
+        for segment in segments:
+            if segment.kind == "text":
+                self.display(segment.text, "assistant")
+            elif segment.kind == "code":
+                self.display(segment.text, "code")
+                if self.code_block:
+                    self.code_block[1].append(segment.text)
+            elif segment.kind == "open":
+                self.code_block = [self.gui.code_highlighter.begin(), [], segment.lang]
+            elif segment.kind == "close":
+                self.finish_code_block()
+
+    def finish_code_block(self):
+        if self.code_block:
+            mark, parts, lang = self.code_block
+            self.gui.code_highlighter.submit(mark, "".join(parts), lang)
+            self.code_block = None
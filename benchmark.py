@@ -0,0 +1,259 @@
+"""Offline benchmark of the request pipeline against a local mock endpoint.
+
+Drives APIHandler.process_request/handle_response with a headless stand-in for
+the GUI (the real StreamRenderer and CodeBlockHighlighter, drawing into a fake
+Text widget) and reports throughput, TTFT overhead, render queue depth and
+memory per scenario.
+
+    python benchmark.py                          # run every scenario, compare with the baseline
+    python benchmark.py --save-baseline          # run and store the results as the new baseline
+    python benchmark.py -s code-100kb -r 5       # one scenario, five runs
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from api import APIHandler
+from config import Config
+from frontend import Frontend
+from highlighter import CodeBlockHighlighter
+from mockserver import MockServer, code_reply, prose_reply
+from render import StreamRenderer
+
+SCENARIOS = {
+    "baseline-4kb": {"history_turns": 10, "reply": "prose", "size": 4096, "rate": 400, "chunk": 1, "latency": 0.05},
+    "history-10k-turns": {"history_turns": 10000, "reply": "prose", "size": 4096, "rate": 400, "chunk": 1, "latency": 0.05},
+    "code-100kb": {"history_turns": 10, "reply": "code", "size": 100 * 1024, "rate": 5000, "chunk": 4, "latency": 0.05},
+    "stream-1000tps": {"history_turns": 10, "reply": "prose", "size": 16 * 1024, "rate": 1000, "chunk": 1, "latency": 0.05},
+}
+# Metric -> (smaller is better, change below which differences are noise)
+METRICS = {
+    "total_s": (True, 0.05),
+    "build_ms": (True, 5.0),
+    "ttft_overhead_ms": (True, 5.0),
+    "tokens_per_s": (False, 0.0),
+    "render_lag_max_ms": (True, 5.0),
+    "queue_depth_max": (True, 10),
+    "inserts": (True, 10),
+    "peak_memory_mb": (True, 1.0),
+}
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+class HeadlessText:
+    """Just enough of a tk.Text for the renderer and highlighter to run without a display."""
+
+    def __init__(self):
+        self.chars = 0
+        self.inserts = 0
+        self.tags_added = 0
+        self.marks = set()
+
+    def insert(self, index, *args):
+        self.chars += sum(len(text) for text in args[::2])
+        self.inserts += 1
+
+    def config(self, **options):
+        pass
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def mark_set(self, name, index):
+        self.marks.add(name)
+
+    def mark_gravity(self, name, gravity):
+        pass
+
+    def mark_unset(self, name):
+        self.marks.discard(name)
+
+    def mark_names(self):
+        return tuple(self.marks)
+
+    def index(self, mark):
+        return "1.0"
+
+    def tag_add(self, tag, *indices):
+        self.tags_added += len(indices) // 2
+
+    def tag_configure(self, tag, **options):
+        pass
+
+    def tag_raise(self, tag):
+        pass
+
+
+class HeadlessGUI(Frontend):
+    """Front end that draws into a HeadlessText. frame() stands in for EmoChatGUI.pump_events."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.errors = []
+        self.widget = HeadlessText()
+        self.renderer = StreamRenderer(self.widget, fps=config.render_fps)
+        self.api_handler = APIHandler(self)
+        self.code_highlighter = CodeBlockHighlighter(self.renderer, self.api_handler.engine.post)
+
+    def show_error(self, message):
+        self.errors.append(message)
+
+    def frame(self):
+        """One UI frame; returns the UI queue depth found at its start."""
+        depth = self.api_handler.engine.events.qsize()
+        self.api_handler.engine.pump()
+        self.renderer.flush()
+        return depth
+
+
+def make_config(directory, server):
+    config = Config(os.path.join(directory, "config.json"))
+    config.available_models = [{
+        "name": "mock", "api_key": "bench", "base_url": server.base_url,
+        "context_window": 65536, "max_output_tokens": 8192, "pricing": {"input": 0, "output": 0},
+    }]
+    config.model.set("mock")
+    config.retrieval_enabled = False
+    config.response_cache_enabled = False
+    config.compaction_enabled = False
+    return config
+
+
+def fill_history(conversation, turns):
+    for n in range(turns):
+        conversation.add("user", f"Question {n}: how would I refactor handler_{n} to retry on timeouts?")
+        conversation.add("assistant", prose_reply(600))
+
+
+def run_once(gui, scenario, measure_memory=False, timeout=300):
+    handler = gui.api_handler
+    gui.conversation.clear()
+    fill_history(gui.conversation, scenario["history_turns"])
+    done = len(handler.telemetry.recent())
+    inserts = gui.widget.inserts
+    depths = []
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    handler.submit("Show me the whole module again, please.")
+    deadline = start + timeout
+    while len(handler.telemetry.recent()) == done or handler.engine.events.qsize():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("request did not finish")
+        depths.append(gui.frame())
+        time.sleep(gui.renderer.frame_interval)
+    gui.frame()
+    total = time.perf_counter() - start
+    peak = 0
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if gui.errors:
+        raise RuntimeError(gui.errors.pop())
+    trace = handler.telemetry.recent()[-1]
+    build = trace.start - start
+    return {
+        "total_s": total,
+        "build_ms": build * 1000,
+        "ttft_overhead_ms": (build + (trace.ttft or 0) - scenario["latency"]) * 1000,
+        "tokens_per_s": trace.tokens_per_second,
+        "render_lag_max_ms": trace.render_lag_max * 1000,
+        "queue_depth_max": max(depths, default=0),
+        "inserts": gui.widget.inserts - inserts,
+        "peak_memory_mb": peak / 1024 / 1024,
+    }
+
+
+def run_scenario(gui, server, name, repeat):
+    scenario = SCENARIOS[name]
+    server.reply = (code_reply if scenario["reply"] == "code" else prose_reply)(scenario["size"])
+    server.tokens_per_second = scenario["rate"]
+    server.chunk_tokens = scenario["chunk"]
+    server.latency = scenario["latency"]
+    runs = [run_once(gui, scenario) for _ in range(repeat)]
+    memory = run_once(gui, scenario, measure_memory=True)  # tracemalloc slows everything, so it gets its own run
+    result = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS if metric != "peak_memory_mb"}
+    result["peak_memory_mb"] = memory["peak_memory_mb"]
+    result["target_tokens_per_s"] = scenario["rate"]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric against the baseline; returns the regressions found."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            print(f"{name}: not in baseline")
+            continue
+        for metric, (smaller_is_better, noise) in METRICS.items():
+            if metric not in old:
+                continue
+            before, after = old[metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            worse = after > before if smaller_is_better else after < before
+            flag = ""
+            if worse and abs(after - before) > noise and abs(change) > tolerance:
+                flag = "  REGRESSION"
+                regressions.append((name, metric))
+            print(f"  {name:<20} {metric:<18} {before:>10.2f} -> {after:>10.2f} ({change:+.0%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline against a local mock endpoint.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs per scenario (median is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change that counts as a regression")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = MockServer().start()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        gui = HeadlessGUI(make_config(directory, server))
+        server.reply, server.tokens_per_second = prose_reply(256), 0
+        run_once(gui, {"history_turns": 0, "latency": server.latency})  # Warm-up: imports, connection pool
+        for name in args.scenario or SCENARIOS:
+            print(f"Running {name}...", flush=True)
+            results[name] = run_scenario(gui, server, name, args.repeat)
+            print("  " + ", ".join(f"{metric} {value:.2f}" for metric, value in results[name].items()), flush=True)
+        gui.api_handler.engine.stop()
+    server.stop()
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Against baseline of {baseline.get('created')}:")
+    regressions = compare(results, baseline, args.tolerance)
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+from tokens import MESSAGE_OVERHEAD
+
+SUMMARY_HEADER = "\n\nSummary of the earlier conversation (older messages are not repeated):\n"
+
+DEFAULT_CONTEXT_WINDOW = 32768  # For available_models entries that don't set context_window
+DEFAULT_MAX_OUTPUT = 8096
+MIN_OUTPUT = 1024  # Room always left for the reply when choosing history
+
+# messages: API dicts to send; input_tokens: their count; max_tokens: for the reply;
+# dropped: turns (lists of Messages) left out, oldest first
+Plan = namedtuple("Plan", "messages input_tokens max_tokens dropped")
+
+
+def split_turns(messages):
+    """Group messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if message.role == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def fit_history(messages, system_prompt, counter, model, total=None, summary=None, payload=None):
+    """Choose the history to send so the request fits the model's context window.
+
+    The system prompt and the newest turn always go. Pinned turns come next,
+    then the most recent turns, newest first, until the budget runs out; the
+    turns in between are dropped whole so roles keep alternating. max_tokens
+    is whatever the window has left, capped by the model's output limit.
+    total, the conversation's running token count, skips the selection when
+    everything fits. A compaction summary covering the first summary.covered
+    messages is appended to the system prompt and replaces them; pinned turns
+    among them are still sent as they are. payload, the messages' cached API
+    dicts (Conversation.history), is sent as it is when everything fits.
+    """
+    window = model.get("context_window", DEFAULT_CONTEXT_WINDOW)
+    max_output = model.get("max_output_tokens", DEFAULT_MAX_OUTPUT)
+    margin = int(window * (0.02 if counter.exact else 0.1))  # Estimated counts can be off
+    turns = []
+    if summary is not None and summary.covered <= len(messages):
+        system_prompt += SUMMARY_HEADER + summary.text
+        turns = [turn for turn in split_turns(messages[:summary.covered]) if any(m.pinned for m in turn)]
+        messages = messages[summary.covered:]
+        total = None  # The running total includes the summarised messages
+    used = counter.count(system_prompt) + MESSAGE_OVERHEAD
+    budget = window - margin - min(MIN_OUTPUT, max_output)
+    if total is not None and used + total <= budget:
+        if payload is None:
+            payload = [message.to_dict() for message in messages]
+        payload = [{"role": "system", "content": system_prompt}] + payload
+        return Plan(payload, used + total, min(max_output, window - margin - used - total), [])
+
+    turns += split_turns(messages)
+    sizes = [sum(counter.count_message(message) for message in turn) for turn in turns]
+    keep = set()
+    if turns:
+        keep.add(len(turns) - 1)
+        used += sizes[-1]
+    for i, turn in enumerate(turns[:-1]):
+        if any(message.pinned for message in turn) and used + sizes[i] <= budget:
+            keep.add(i)
+            used += sizes[i]
+    for i in range(len(turns) - 2, -1, -1):
+        if i in keep:
+            continue
+        if used + sizes[i] > budget:
+            break
+        keep.add(i)
+        used += sizes[i]
+
+    payload = [{"role": "system", "content": system_prompt}]
+    dropped = []
+    for i, turn in enumerate(turns):
+        if i in keep:
+            payload.extend(message.to_dict() for message in turn)
+        else:
+            dropped.append(turn)
+    max_tokens = min(max_output, window - margin - used)
+    if max_tokens <= 0:
+        raise ValueError(f"Message is too long for the model's {window}-token context window")
+    return Plan(payload, used, max_tokens, dropped)
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+
+def cache_key(model, messages):
+    """Hash of the model and the exact messages sent (system prompt included)."""
+    normalised = [
+        [message["role"], message["content"].replace("\r\n", "\n").strip()] for message in messages
+    ]
+    blob = json.dumps([model, normalised], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of replies in SQLite, with a TTL and least-recently-used eviction.
+
+    All database work happens on one private thread that owns the connection;
+    the async methods are awaited from the stream engine's loop.
+    """
+
+    def __init__(self, path, ttl_hours=168, max_mb=50):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.lookups = 0
+        self._db = None
+        self._size = 0  # Bytes of content stored, kept in step with the table
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    async def get(self, key):
+        self.lookups += 1
+        content = await self._run(self._get, key)
+        if content is not None:
+            self.hits += 1
+        return content
+
+    async def put(self, key, content):
+        await self._run(self._put, key, content)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL, "
+                "accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._db
+
+    def _get(self, key):
+        db = self._connect()
+        row = db.execute("SELECT content, created, size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        content, created, size = row
+        now = time.time()
+        if created < now - self.ttl:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            db.commit()
+            return None
+        db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        db.commit()
+        return content
+
+    def _put(self, key, content):
+        db = self._connect()
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, content, now, now, size))
+        self._size += size - (old[0] if old else 0)
+        while self._size > self.max_bytes:
+            # Evict least recently used entries in batches until back under the limit
+            rows = db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            for old_key, old_size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                self._size -= old_size
+        db.commit()
+
+
+class CachedStream:
+    """Replays cached text shaped like an AsyncStream of chat completion chunks."""
+
+    CHUNK = 64  # Characters per replayed chunk
+
+    def __init__(self, content):
+        self.content = content
+
+    async def __aiter__(self):
+        for start in range(0, len(self.content), self.CHUNK):
+            delta = SimpleNamespace(content=self.content[start:start + self.CHUNK])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            await asyncio.sleep(0)  # Let the loop breathe between chunks
+
+    async def close(self):
+        pass
+
+
+def cached_completion(content):
+    """Cached text shaped like a non-streaming chat completion."""
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
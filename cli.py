@@ -0,0 +1,271 @@
+"""Headless front end: chat from a terminal or run prompt batches, without Tk.
+
+    python cli.py "Explain this traceback"               # one prompt, reply streamed to stdout
+    cat questions.txt | python cli.py                    # one prompt per line, as one chat
+    python cli.py --batch prompts.jsonl --output results.jsonl --concurrency 8
+
+Batch input is JSON lines with a "prompt" and optionally "id", "model" and
+"system"; each prompt is sent on its own, without history. Results are
+written as JSON lines in the order they finish.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from api import APIHandler, ChatRequest
+from budget import fit_history
+from config import Config
+from conversation import Message
+from frontend import Frontend
+from telemetry import RequestTrace
+from tokens import cost, counter_for
+
+REPLY_MARKER = "\n> "  # What the GUI shows before a reply; stdout carries the reply alone
+
+
+class ConsoleRenderer:
+    """Writes streamed replies to stdout; echoes of the user's input are left out, errors go to stderr."""
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+
+    def write(self, text, tag=None):
+        if tag == "user" or (tag == "assistant" and text == REPLY_MARKER):
+            return
+        (sys.stderr if tag == "error" else self.out).write(text)
+
+    def mark(self, name):
+        pass
+
+    def call(self, fn, *args):
+        fn(*args)
+
+    def flush(self):
+        self.out.flush()
+
+
+class ConsoleFrontend(Frontend):
+    """Chat front end for the terminal; the main thread pumps the UI queue while a reply streams."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.renderer = ConsoleRenderer()
+        self.api_handler = APIHandler(self)
+        self.idle = threading.Event()
+        self.errors = 0
+
+    def manage_thinking_animation(self, state=None):
+        if state == "stop":
+            self.idle.set()  # Posted last by process_request, after everything it displayed
+
+    def show_error(self, message):
+        self.errors += 1
+        super().show_error(message)
+
+    def ask(self, text):
+        """Send text as the next chat message and stream the reply; Ctrl+C cancels it."""
+        self.idle.clear()
+        self.api_handler.submit(text)
+        try:
+            self.pump_until_idle()
+        except KeyboardInterrupt:
+            self.api_handler.cancel(drop_queued=True)
+            self.pump_until_idle()
+        self.renderer.out.write("\n")
+        self.renderer.flush()
+
+    def pump_until_idle(self):
+        engine = self.api_handler.engine
+        while not self.idle.is_set():
+            engine.pump()
+            self.renderer.flush()
+            self.idle.wait(0.01)
+        engine.pump()
+        self.renderer.flush()
+
+
+def model_entry(config, name):
+    for model in config.available_models:
+        if model["name"] == name:
+            return model
+    raise ValueError(f"Unknown model: {name}")
+
+
+async def complete(handler, config, item):
+    """Send one batch item through the router and return its result record."""
+    name = item.get("model") or config.model.get()
+    trace = RequestTrace(name, "")
+    counter, model = None, {}
+    parts, usage, error = [], None, None
+    try:
+        model = model_entry(config, name)
+        system_prompt = item.get("system", config.system_prompt.get())
+        request = ChatRequest(item["prompt"], name, True, system_prompt,
+                              model.get("base_url", ""), model.get("api_key", ""), model)
+        request.trace, trace.base_url = trace, request.base_url
+        counter = counter_for(model)
+        plan = fit_history([Message("user", item["prompt"])], system_prompt, counter, model)
+        async with handler.engine.streams:
+            response = await handler.router.open(
+                handler.clients, request, lambda note: print(f"[{item.get('id')}] {note}", file=sys.stderr),
+                messages=plan.messages,
+                stream=True,
+                max_tokens=plan.max_tokens,
+                stream_options={"include_usage": True}
+            )
+            try:
+                async for chunk in response:
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content or ""
+                    if content:
+                        trace.chunk()
+                        parts.append(content)
+            finally:
+                await response.close()
+        trace.input_tokens = usage.prompt_tokens if usage and usage.prompt_tokens else plan.input_tokens
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = str(e)
+        trace.outcome = "error"
+    trace.finish()
+    reply = "".join(parts)
+    if usage and usage.completion_tokens:
+        trace.output_tokens = usage.completion_tokens
+    elif counter is not None:
+        trace.output_tokens = counter.count(reply)
+    handler.telemetry.record(trace)
+    return {
+        "id": item.get("id"),
+        "model": name,
+        "reply": reply,
+        "error": error,
+        "input_tokens": trace.input_tokens,
+        "output_tokens": trace.output_tokens,
+        "cost": cost(model, trace.input_tokens, trace.output_tokens),
+        "ttft_s": trace.ttft,
+        "total_s": trace.end,
+        "attempts": trace.attempts,
+    }
+
+
+async def run_batch(handler, config, items, output, concurrency):
+    """Feed items to `concurrency` workers on the engine loop; returns (done, failed, output tokens)."""
+    totals = [0, 0, 0]
+
+    async def worker():
+        for index, item in items:  # Shared iterator: each line is taken by exactly one worker
+            if not isinstance(item, dict) or "prompt" not in item:
+                result = {"id": index, "error": "expected a JSON object with a \"prompt\""}
+            else:
+                item.setdefault("id", index)
+                result = await complete(handler, config, item)
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            totals[0] += 1
+            totals[1] += result["error"] is not None
+            totals[2] += result.get("output_tokens", 0)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return totals
+
+
+def read_items(source):
+    """(line number, parsed JSON) for each non-blank line of source."""
+    with source:
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError:
+                yield number, None
+
+
+def batch(config, args):
+    concurrency = max(1, args.concurrency or config.max_concurrent_streams)
+    config.max_concurrent_streams = concurrency  # The engine's stream semaphore is the real bound
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    handler = APIHandler(Frontend(config))
+    start = time.perf_counter()
+    future = handler.engine.submit(run_batch(handler, config, read_items(source), output, concurrency))
+    try:
+        done, failed, tokens = future.result()
+    except KeyboardInterrupt:
+        future.cancel()
+        print("Batch interrupted", file=sys.stderr)
+        return 130
+    finally:
+        handler.engine.stop()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"{done} prompt(s), {failed} failed, {elapsed:.1f}s, {tokens / elapsed if elapsed else 0:.0f} output tok/s "
+          f"at concurrency {concurrency}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def read_prompts(args):
+    """The prompt given on the command line, or one per line of stdin, prompted for on a terminal."""
+    if args.prompt is not None:
+        yield args.prompt
+        return
+    interactive = sys.stdin.isatty()
+    while True:
+        if interactive:
+            print(">: ", end="", file=sys.stderr, flush=True)  # Before the read, so it shows while waiting
+        line = sys.stdin.readline()
+        if not line:
+            return
+        yield line
+
+
+def chat(config, args):
+    frontend = ConsoleFrontend(config)
+    try:
+        for line in read_prompts(args):
+            text = line.strip()
+            if text:
+                frontend.ask(text)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frontend.api_handler.engine.stop()
+    return 1 if frontend.errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PikaChat without the GUI.")
+    parser.add_argument("prompt", nargs="?", help="message to send (default: one per line of stdin)")
+    parser.add_argument("--config", default="config.json", help="config file (default: config.json)")
+    parser.add_argument("-m", "--model", help="model name from available_models")
+    parser.add_argument("--system", help="system prompt to use instead of the configured one")
+    parser.add_argument("--no-stream", action="store_true", help="wait for whole replies (chat mode)")
+    parser.add_argument("--batch", metavar="JSONL", help="run the prompts in this JSONL file (- for stdin)")
+    parser.add_argument("-o", "--output", help="where batch results go (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, help="batch requests in flight (default: max_concurrent_streams)")
+    args = parser.parse_args(argv)
+
+    config = Config(args.config)
+    if args.model:
+        if args.model not in config.get_available_model_names():
+            parser.error(f"unknown model {args.model!r}; available: {', '.join(config.get_available_model_names())}")
+        config.model.set(args.model)
+    if args.system is not None:
+        config.system_prompt.set(args.system)
+    if args.no_stream:
+        config.streaming.set(False)
+    if args.batch:
+        return batch(config, args)
+    return chat(config, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
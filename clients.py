@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from openai import AsyncOpenAI
+
+
+class ClientRegistry:
+    """One long-lived AsyncOpenAI client per (base_url, api_key).
+
+    Each client owns an httpx connection pool, so reusing it lets follow-up
+    requests skip DNS, TCP and TLS setup. Clients are only rebuilt when the
+    configured model list changes. Only used on the stream engine's loop,
+    which the clients' pools are bound to.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        self._fingerprint = None
+
+    def sync(self, available_models):
+        """Drop every client if the model/endpoint configuration changed."""
+        fingerprint = json.dumps(available_models, sort_keys=True)
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+        stale, self.clients = self.clients, {}
+        for client in stale.values():
+            asyncio.ensure_future(client.close())
+
+    def get(self, base_url, api_key):
+        key = (base_url, api_key)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        return client
+
+    async def warm_up(self, base_url, api_key):
+        """Open a pooled connection so the next request starts hot."""
+        if not base_url or not api_key:
+            return
+        try:
+            # Any response will do, the point is the TCP/TLS handshake
+            await self.get(base_url, api_key).with_options(timeout=5, max_retries=0).models.list()
+        except Exception:
+            pass
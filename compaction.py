@@ -0,0 +1,93 @@
+import asyncio
+from collections import namedtuple
+
+from budget import split_turns
+
+# covered: how many leading messages the summary stands in for
+Summary = namedtuple("Summary", "covered text")
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a chat between a user and an assistant, "
+    "for the assistant's own later reference. Merge the previous summary with the new "
+    "messages. Keep facts, decisions, names of files, functions and commands, code that "
+    "was agreed on, and open questions. Drop pleasantries. Plain text, as short as possible."
+)
+MAX_MESSAGE_CHARS = 6000  # Longer messages are cut before being summarised
+
+
+class Compactor:
+    """Rolls old turns into a summary with a cheap model, off the chat's critical path.
+
+    After a reply, if the messages not yet covered by a summary have grown past
+    the threshold, every turn but the last few is summarised in a background task on the engine loop.
+    Each summary covers messages [0, covered) and is built from the previous
+    one plus the messages after it, so no range is summarised twice. The
+    budgeter then sends the summary in place of those messages; chat_display
+    still shows the full transcript.
+    """
+
+    def __init__(self, clients, config):
+        self.clients = clients
+        self.enabled = config.compaction_enabled
+        self.threshold = config.compaction_threshold_tokens
+        self.keep_turns = config.compaction_keep_turns
+        self.summary_tokens = config.compaction_summary_tokens
+        self.model = next(
+            (model for model in config.available_models if model["name"] == config.compaction_model), None
+        )
+        self.summary = None  # Latest, covering the most messages
+        self._task = None
+        self._generation = 0  # Bumped by reset() so a summary of a cleared chat is thrown away
+
+    def reset(self):
+        """Forget the summary (the chat was cleared). Loop thread only."""
+        self._generation += 1
+        self.summary = None
+
+    def maybe_compact(self, conversation, counter):
+        """Start a background summary if the history is over the threshold. Loop thread only."""
+        if not self.enabled or not self.model or not self.model.get("api_key"):
+            return
+        if self._task is not None and not self._task.done():
+            return  # One at a time; the next reply will pick up where it left off
+        if conversation.token_total(counter) < self.threshold:
+            return
+        messages = conversation.snapshot()
+        start = self.summary.covered if self.summary else 0
+        if sum(counter.count_message(message) for message in messages[start:]) < self.threshold:
+            return  # What the summary doesn't cover still fits comfortably
+        turns = split_turns(messages)
+        end = sum(len(turn) for turn in turns[:-self.keep_turns]) if len(turns) > self.keep_turns else 0
+        if end <= start:
+            return
+        self._task = asyncio.ensure_future(self._compact(messages, start, end, self._generation))
+
+    async def _compact(self, messages, start, end, generation):
+        previous = self.summary.text if self.summary and start else "(none yet)"
+        transcript = "\n\n".join(
+            f"{message.role.capitalize()}: {self._clip(message.content)}" for message in messages[start:end]
+        )
+        client = self.clients.get(self.model["base_url"], self.model["api_key"])
+        try:
+            response = await client.chat.completions.create(
+                model=self.model["name"],
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Previous summary:\n{previous}\n\nNew messages:\n{transcript}"},
+                ],
+                max_tokens=self.summary_tokens,
+                stream=False
+            )
+        except Exception as e:
+            print(f"Compaction failed: {e}")
+            return
+        text = (response.choices[0].message.content or "").strip()
+        if text and generation == self._generation:
+            self.summary = Summary(end, text)
+
+    @staticmethod
+    def _clip(text):
+        if len(text) <= MAX_MESSAGE_CHARS:
+            return text
+        half = MAX_MESSAGE_CHARS // 2
+        return f"{text[:half]}\n[...]\n{text[-half:]}"
@@ -0,0 +1,143 @@
+import tkinter as tk
+from tkinter import ttk
+
+from render import StreamRenderer
+
+STATS_COLUMNS = ("Model", "TTFT", "Tokens/s", "Latency", "Tokens")
+
+
+def ask_models(root, config, on_send):
+    """Small dialog to tick the models a prompt is fanned out to; calls on_send(names)."""
+    dialog = tk.Toplevel(root)
+    dialog.title("Compare models")
+    dialog.configure(bg=config.bg_color)
+    dialog.transient(root)
+    selected = {}
+    for name in config.get_available_model_names():
+        selected[name] = tk.BooleanVar(value=name == config.model.get())
+        tk.Checkbutton(
+            dialog, text=name, variable=selected[name], anchor=tk.W,
+            bg=config.bg_color, fg=config.fg_color, selectcolor=config.code_bg,
+            activebackground=config.bg_color, activeforeground=config.fg_color, font=config.text_font
+        ).pack(fill=tk.X, padx=10, pady=2)
+
+    def send():
+        names = [name for name, var in selected.items() if var.get()]
+        dialog.destroy()
+        if names:
+            on_send(names)
+
+    tk.Button(
+        dialog, text="Send to selected", command=send,
+        bg=config.bg_color, fg=config.fg_color, activebackground=config.code_bg,
+        activeforeground=config.code_fg, relief="flat", font=config.text_font
+    ).pack(side=tk.RIGHT, padx=10, pady=10)
+
+
+class ComparisonWindow:
+    """Replies of several models to the same prompt, one tab each, with their timings side by side.
+
+    Text arrives through the stream engine's UI queue like the main chat;
+    each tab has its own StreamRenderer, flushed once per frame while the
+    window is open. Closing the window cancels the streams still running.
+    """
+
+    def __init__(self, root, config, prompt, names, on_keep):
+        self.config = config
+        self.prompt = prompt
+        self.on_keep = on_keep  # Called with (prompt, reply) to continue the chat with one of the replies
+        self.future = None  # Set by the caller: the fan-out running on the engine loop
+        self.closed = False
+        self.replies = {}
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Compare: {prompt[:60]}")
+        self.window.geometry("1000x700")
+        self.window.configure(bg=config.bg_color)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        table = tk.Frame(self.window, bg=config.bg_color)
+        table.pack(fill=tk.X, padx=10, pady=(10, 0))
+        self.cells = {}
+        for column, heading in enumerate(STATS_COLUMNS):
+            tk.Label(table, text=heading, bg=config.bg_color, fg=config.kaomoji_color,
+                     font=config.text_font, anchor=tk.W).grid(row=0, column=column, sticky=tk.W, padx=6)
+        for row, name in enumerate(names, start=1):
+            self.cells[name] = []
+            for column in range(len(STATS_COLUMNS)):
+                label = tk.Label(table, text=name if column == 0 else "…", bg=config.bg_color,
+                                 fg=config.fg_color, font=config.text_font, anchor=tk.W)
+                label.grid(row=row, column=column, sticky=tk.W, padx=6)
+                self.cells[name].append(label)
+        self.wall_label = tk.Label(self.window, text="Waiting for replies…", bg=config.bg_color,
+                                   fg=config.loading_color, font=config.text_font, anchor=tk.W)
+        self.wall_label.pack(fill=tk.X, padx=16)
+
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.renderers = {}
+        self.keep_buttons = {}
+        for name in names:
+            tab = tk.Frame(notebook, bg=config.bg_color)
+            notebook.add(tab, text=name)
+            text = tk.Text(
+                tab, wrap=tk.WORD, state=tk.DISABLED, bg=config.bg_color, fg=config.fg_color,
+                font=config.output_font, relief="flat", padx=10, pady=10, highlightthickness=1,
+                highlightcolor=config.green_border, highlightbackground=config.green_border
+            )
+            text.tag_configure("assistant", foreground=config.fg_color)
+            text.tag_configure("code", background=config.code_bg, foreground=config.code_fg)
+            text.tag_configure("error", foreground="#f44336")
+            button = tk.Button(
+                tab, text="Use this reply", state=tk.DISABLED, command=lambda n=name: self.keep(n),
+                bg=config.bg_color, fg=config.fg_color, activebackground=config.code_bg,
+                activeforeground=config.code_fg, relief="flat", font=config.text_font
+            )
+            button.pack(side=tk.BOTTOM, anchor=tk.E, padx=5, pady=5)
+            text.pack(fill=tk.BOTH, expand=True)
+            self.renderers[name] = StreamRenderer(text, fps=config.render_fps)
+            self.keep_buttons[name] = button
+        self._flush()
+
+    def _flush(self):
+        if self.closed:
+            return
+        for renderer in self.renderers.values():
+            renderer.flush()
+        self.window.after(max(1, int(1000 / max(1, self.config.render_fps))), self._flush)
+
+    def write(self, name, text, tag):
+        if not self.closed:
+            self.renderers[name].write(text, tag)
+
+    def set_stats(self, name, ttft, rate, latency, tokens, reply):
+        if self.closed:
+            return
+        cells = self.cells[name]
+        cells[1].config(text=f"{ttft:.2f}s")
+        cells[2].config(text=f"{rate:.1f}")
+        cells[3].config(text=f"{latency:.2f}s")
+        cells[4].config(text=str(tokens))
+        if reply.strip():
+            self.replies[name] = reply
+            self.keep_buttons[name].config(state=tk.NORMAL)
+
+    def fail(self, name, message):
+        if self.closed:
+            return
+        self.renderers[name].write(f"\nERROR: {message}\n", "error")
+        for cell in self.cells[name][1:]:
+            cell.config(text="error", fg="#f44336")
+
+    def finished(self, wall_time):
+        if not self.closed:
+            self.wall_label.config(text=f"Wall time: {wall_time:.2f}s (streams ran concurrently)")
+
+    def keep(self, name):
+        if self.on_keep(self.prompt, self.replies[name]):
+            self.close()
+
+    def close(self):
+        self.closed = True
+        if self.future is not None:
+            self.future.cancel()  # Stops the streams still running, which closes their responses
+        self.window.destroy()
@@ -1,14 +1,27 @@
 import json
-import tkinter as tk
 import os
+import sys
 import warnings
 
+
+class Setting:
+    """Plain value with the get()/set() of a Tk variable, so Config loads without a display."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
 class Config:
     def __init__(self, config_path="config.json"):
-        self.root = tk.Tk()
-        self.model = tk.StringVar(value="deepseek-chat")
-        self.streaming = tk.BooleanVar(value=True)
-        self.system_prompt = tk.StringVar(value="You are pikachu! my assistant!. Respond in raw text without formatting symbols like ** or ## (THE ONLY EXCEPTION IS CODE BLOCKS OR COMMANDS. YOU CAN USE CODEBLOCKS FOR SCRIPTS AND WRAP COMMANDS IN CODE BLOCKS). You may use the ⚡ emoji")
+        self.model = Setting("deepseek-chat")
+        self.streaming = Setting(True)
+        self.system_prompt = Setting("You are pikachu! my assistant!. Respond in raw text without formatting symbols like ** or ## (THE ONLY EXCEPTION IS CODE BLOCKS OR COMMANDS. YOU CAN USE CODEBLOCKS FOR SCRIPTS AND WRAP COMMANDS IN CODE BLOCKS). You may use the ⚡ emoji")
         self.bg_color = "#1a1a1a"
         self.fg_color = "#e0e0e0"
         self.code_bg = "#2d2d2d"
@@ -27,13 +40,55 @@ class Config:
             "⚡️\\(^ω^)/ --------== ᶻ 𝗓 𐰁   !!"
         ]
         self.hide_scrollbars = True
+        self.ping_interval_min = 2.0  # Seconds between latency probes while the endpoint is unsettled
+        self.ping_interval_max = 30.0  # Probe interval ceiling once latency is steady
+        self.render_fps = 30  # Max redraws per second of streamed text in the chat view
+        self.file_exclude_globs = [".git", "node_modules", "__pycache__", ".venv", "*.pyc"]  # Never listed in the file pane
+        self.respect_gitignore = True
+        self.watch_interval = 1.0  # Seconds between checks of the open folder for changes on disk
+        self.large_file_threshold_mb = 10  # Bigger files open in the read-only, memory-mapped viewer
+        self.max_concurrent_streams = 4  # API streams the engine runs at once
+        self.compaction_enabled = False  # Summarise old turns with compaction_model once history gets long
+        self.compaction_model = "deepseek-chat"  # Cheap model from available_models used for summaries
+        self.compaction_threshold_tokens = 24000
+        self.compaction_keep_turns = 6  # Most recent turns never summarised
+        self.compaction_summary_tokens = 1024
+        self.response_cache_enabled = False  # Replay identical requests from disk instead of calling the API
+        self.response_cache_path = "response_cache.sqlite3"
+        self.response_cache_ttl_hours = 168
+        self.response_cache_max_mb = 50
+        self.session_store_path = "sessions.sqlite3"
+        self.restore_last_session = True
+        self.session_tail_messages = 200  # Messages loaded when a session is reopened (and per scroll-up page)
+        self.retrieval_enabled = False  # Index the open folder and add relevant excerpts to each request (sent to the provider)
+        self.retrieval_top_k = 5
+        self.retrieval_max_tokens = 2000  # Budget for the added excerpts
+        self.retrieval_rescan_interval = 0  # Seconds between mtime sweeps of the whole folder; 0 relies on watcher changes only
+        self.routing_groups = []  # Lists of model names served by interchangeable endpoints, e.g. the same model on two providers
+        self.retry_max_attempts = 3  # Tries per request across the endpoints of its group
+        self.retry_base_delay = 0.5  # Seconds; doubled per retry of the same endpoint, with full jitter
+        self.retry_max_delay = 8.0
+        self.telemetry_capacity = 500  # Request traces kept for the stats panel and export
+        self.debug_logging = False  # Also PIKACHAT_DEBUG=1; both can be flipped at runtime from the Debug menu
+        self.debug_spans = False  # Time spent in build/network/parse/render per request (PIKACHAT_TRACE=1)
+        self.profile_dir = "profiles"  # Where "Profile Next Request" (PIKACHAT_PROFILE=1) writes its report
         self.available_models = [
-            {"name": "deepseek-chat", "api_key": "", "base_url": "https://api.deepseek.com/v1"},
-            {"name": "deepseek-reasoner", "api_key": "", "base_url": "https://api.deepseek.com/v1"}
+            {"name": "deepseek-chat", "api_key": "", "base_url": "https://api.deepseek.com/v1",
+             "context_window": 65536, "max_output_tokens": 8192,
+             "pricing": {"input": 0.27, "output": 1.10}},  # USD per million tokens
+            {"name": "deepseek-reasoner", "api_key": "", "base_url": "https://api.deepseek.com/v1",
+             "context_window": 65536, "max_output_tokens": 8192,
+             "pricing": {"input": 0.55, "output": 2.19}}
         ]
 
         self.load_config(config_path)
-        self.root.destroy()
+
+    def bind_tk(self, master):
+        """Swap the settings the UI edits for Tk variables holding the same values."""
+        import tkinter as tk
+        self.model = tk.StringVar(master, value=self.model.get())
+        self.streaming = tk.BooleanVar(master, value=self.streaming.get())
+        self.system_prompt = tk.StringVar(master, value=self.system_prompt.get())
 
     def load_config(self, config_path):
         try:
@@ -55,11 +110,43 @@ class Config:
                     "text_font": list(self.text_font),
                     "loading_frames_list": self.loading_frames_list,
                     "kaomojis_list": self.kaomojis_list,
-                    "hide_scrollbars": self.hide_scrollbars
+                    "hide_scrollbars": self.hide_scrollbars,
+                    "ping_interval_min": self.ping_interval_min,
+                    "ping_interval_max": self.ping_interval_max,
+                    "render_fps": self.render_fps,
+                    "file_exclude_globs": self.file_exclude_globs,
+                    "respect_gitignore": self.respect_gitignore,
+                    "watch_interval": self.watch_interval,
+                    "large_file_threshold_mb": self.large_file_threshold_mb,
+                    "max_concurrent_streams": self.max_concurrent_streams,
+                    "compaction_enabled": self.compaction_enabled,
+                    "compaction_model": self.compaction_model,
+                    "compaction_threshold_tokens": self.compaction_threshold_tokens,
+                    "compaction_keep_turns": self.compaction_keep_turns,
+                    "compaction_summary_tokens": self.compaction_summary_tokens,
+                    "response_cache_enabled": self.response_cache_enabled,
+                    "response_cache_path": self.response_cache_path,
+                    "response_cache_ttl_hours": self.response_cache_ttl_hours,
+                    "response_cache_max_mb": self.response_cache_max_mb,
+                    "session_store_path": self.session_store_path,
+                    "restore_last_session": self.restore_last_session,
+                    "session_tail_messages": self.session_tail_messages,
+                    "retrieval_enabled": self.retrieval_enabled,
+                    "retrieval_top_k": self.retrieval_top_k,
+                    "retrieval_max_tokens": self.retrieval_max_tokens,
+                    "retrieval_rescan_interval": self.retrieval_rescan_interval,
+                    "routing_groups": self.routing_groups,
+                    "retry_max_attempts": self.retry_max_attempts,
+                    "retry_base_delay": self.retry_base_delay,
+                    "retry_max_delay": self.retry_max_delay,
+                    "telemetry_capacity": self.telemetry_capacity,
+                    "debug_logging": self.debug_logging,
+                    "debug_spans": self.debug_spans,
+                    "profile_dir": self.profile_dir
                 }
                 with open(config_path, "w") as file:
                     json.dump(default_config, file, indent=2)
-                print(f"Generated new config.json at {config_path}")
+                print(f"Generated new config.json at {config_path}", file=sys.stderr)  # stdout may be carrying CLI output
             else:
                 # Load existing config.json
                 with open(config_path, "r") as file:
@@ -80,8 +167,40 @@ class Config:
                     self.loading_frames_list = config.get("loading_frames_list", self.loading_frames_list)
                     self.kaomojis_list = config.get("kaomojis_list", self.kaomojis_list)
                     self.hide_scrollbars = config.get("hide_scrollbars", self.hide_scrollbars)
+                    self.ping_interval_min = config.get("ping_interval_min", self.ping_interval_min)
+                    self.ping_interval_max = config.get("ping_interval_max", self.ping_interval_max)
+                    self.render_fps = config.get("render_fps", self.render_fps)
+                    self.file_exclude_globs = config.get("file_exclude_globs", self.file_exclude_globs)
+                    self.respect_gitignore = config.get("respect_gitignore", self.respect_gitignore)
+                    self.watch_interval = config.get("watch_interval", self.watch_interval)
+                    self.large_file_threshold_mb = config.get("large_file_threshold_mb", self.large_file_threshold_mb)
+                    self.max_concurrent_streams = config.get("max_concurrent_streams", self.max_concurrent_streams)
+                    self.compaction_enabled = config.get("compaction_enabled", self.compaction_enabled)
+                    self.compaction_model = config.get("compaction_model", self.compaction_model)
+                    self.compaction_threshold_tokens = config.get("compaction_threshold_tokens", self.compaction_threshold_tokens)
+                    self.compaction_keep_turns = config.get("compaction_keep_turns", self.compaction_keep_turns)
+                    self.compaction_summary_tokens = config.get("compaction_summary_tokens", self.compaction_summary_tokens)
+                    self.response_cache_enabled = config.get("response_cache_enabled", self.response_cache_enabled)
+                    self.response_cache_path = config.get("response_cache_path", self.response_cache_path)
+                    self.response_cache_ttl_hours = config.get("response_cache_ttl_hours", self.response_cache_ttl_hours)
+                    self.response_cache_max_mb = config.get("response_cache_max_mb", self.response_cache_max_mb)
+                    self.session_store_path = config.get("session_store_path", self.session_store_path)
+                    self.restore_last_session = config.get("restore_last_session", self.restore_last_session)
+                    self.session_tail_messages = config.get("session_tail_messages", self.session_tail_messages)
+                    self.retrieval_enabled = config.get("retrieval_enabled", self.retrieval_enabled)
+                    self.retrieval_top_k = config.get("retrieval_top_k", self.retrieval_top_k)
+                    self.retrieval_max_tokens = config.get("retrieval_max_tokens", self.retrieval_max_tokens)
+                    self.retrieval_rescan_interval = config.get("retrieval_rescan_interval", self.retrieval_rescan_interval)
+                    self.routing_groups = config.get("routing_groups", self.routing_groups)
+                    self.retry_max_attempts = config.get("retry_max_attempts", self.retry_max_attempts)
+                    self.retry_base_delay = config.get("retry_base_delay", self.retry_base_delay)
+                    self.retry_max_delay = config.get("retry_max_delay", self.retry_max_delay)
+                    self.telemetry_capacity = config.get("telemetry_capacity", self.telemetry_capacity)
+                    self.debug_logging = config.get("debug_logging", self.debug_logging)
+                    self.debug_spans = config.get("debug_spans", self.debug_spans)
+                    self.profile_dir = config.get("profile_dir", self.profile_dir)
         except Exception as e:
-            print(f"Error handling config: {e}")
+            print(f"Error handling config: {e}", file=sys.stderr)
 
     def get_api_key(self):
         selected_model = self.model.get()
@@ -99,5 +218,13 @@ class Config:
         warnings.warn(f"No base URL found for model: {selected_model}")
         return ""
 
+    def get_model_config(self):
+        """The available_models entry of the selected model ({} if it is missing)."""
+        selected_model = self.model.get()
+        for model in self.available_models:
+            if model["name"] == selected_model:
+                return model
+        return {}
+
     def get_available_model_names(self):
         return [model["name"] for model in self.available_models]
\ No newline at end of file
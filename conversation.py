@@ -0,0 +1,145 @@
+import threading
+
+
+class Message:
+    """One turn of the conversation."""
+
+    __slots__ = ("role", "content", "tokens", "pinned", "seq", "_parts")
+
+    def __init__(self, role, content=""):
+        self.role = role
+        self.content = content
+        self.tokens = None  # (counter key, count) once a TokenCounter has seen it
+        self.pinned = False  # Always sent, even when older turns are trimmed
+        self.seq = None  # Position in the session, set when committed
+        self._parts = []  # Streamed chunks, joined once the reply is complete
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content}
+
+
+class Conversation:
+    """Append-only record of the chat. chat_display is only a view of this."""
+
+    def __init__(self, on_commit=None):
+        self.on_commit = on_commit  # Called with each committed message (e.g. to persist it)
+        self.next_seq = 0
+        self.messages = []
+        self._payload = []  # Cached API dicts, grown alongside self.messages
+        self._lock = threading.Lock()
+        self._token_key = None  # Counter key the running total was made with
+        self._token_total = 0
+        self._counted = 0  # Messages included in _token_total
+
+    def add(self, role, content):
+        """Append a complete message and return it."""
+        message = Message(role, content)
+        with self._lock:
+            self._append(message)
+        self._committed(message)
+        return message
+
+    def begin(self, role):
+        """Start a message whose content arrives in chunks (a streamed reply).
+
+        Its seq is reserved now so the view can mark where it starts; a reply
+        that ends up empty just leaves a gap.
+        """
+        message = Message(role)
+        with self._lock:
+            message.seq = self.next_seq
+            self.next_seq += 1
+        return message
+
+    def extend(self, message, text):
+        if text:
+            message._parts.append(text)
+
+    def finish(self, message):
+        """Commit a streamed message. Empty replies are dropped."""
+        if message._parts:
+            message.content += "".join(message._parts)
+            message._parts = []
+        if not message.content.strip():
+            return None
+        with self._lock:
+            self._append(message)
+        self._committed(message)
+        return message
+
+    def _append(self, message):
+        if message.seq is None:
+            message.seq = self.next_seq
+            self.next_seq += 1
+        self.messages.append(message)
+        self._payload.append(message.to_dict())
+
+    def _committed(self, message):
+        if self.on_commit:
+            self.on_commit(message)
+
+    def load(self, stored):
+        """Replace the contents with messages read back from a session store (no on_commit)."""
+        with self._lock:
+            self.messages, self._payload = [], []
+            self._token_key, self._token_total, self._counted = None, 0, 0
+            for item in stored:
+                message = Message(item.role, item.content)
+                message.pinned = item.pinned
+                self.next_seq = item.seq
+                self._append(message)
+
+    def history(self):
+        """(committed messages, their dicts in API format), taken together.
+
+        The per-message dicts are built once when each message is committed,
+        so this only copies references, however long the session gets.
+        """
+        with self._lock:
+            return list(self.messages), list(self._payload)
+
+    def snapshot(self):
+        """Committed messages as of now, safe to read while replies keep arriving."""
+        with self._lock:
+            return list(self.messages)
+
+    def pin_last_turn(self):
+        """Pin the latest user message and the replies after it. Returns the pinned messages."""
+        with self._lock:
+            pinned = []
+            for message in reversed(self.messages):
+                message.pinned = True
+                pinned.append(message)
+                if message.role == "user":
+                    break
+            return pinned
+
+    def unpin_all(self):
+        with self._lock:
+            for message in self.messages:
+                message.pinned = False
+
+    def token_total(self, counter):
+        """Tokens in all committed messages.
+
+        Kept as a running total, so each call only counts the messages added
+        since the last one. Switching to a counter with a different key (another
+        model, or its exact tokenizer finished loading) recounts once.
+        """
+        with self._lock:
+            if counter.key != self._token_key:
+                self._token_key, self._token_total, self._counted = counter.key, 0, 0
+            for message in self.messages[self._counted:]:
+                self._token_total += counter.count_message(message)
+            self._counted = len(self.messages)
+            return self._token_total
+
+    def clear(self):
+        with self._lock:
+            self.messages = []
+            self._payload = []
+            self.next_seq = 0
+            self._token_key, self._token_total, self._counted = None, 0, 0
+
+    def __len__(self):
+        return len(self.messages)
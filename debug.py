@@ -0,0 +1,155 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+class DebugState:
+    """Runtime switches for debug output. Start from config, PIKACHAT_* variables override.
+
+    PIKACHAT_DEBUG turns on log lines, PIKACHAT_TRACE span timings and
+    PIKACHAT_PROFILE arms a profile of the next request. Every check is a
+    plain attribute read, so with everything off the hooks cost next to nothing.
+    """
+
+    def __init__(self):
+        self.logging = _env_flag("PIKACHAT_DEBUG")
+        self.spans = _env_flag("PIKACHAT_TRACE")
+        self.profile_next = _env_flag("PIKACHAT_PROFILE")
+        self.profile_dir = "profiles"
+
+    def configure(self, config):
+        self.logging = config.debug_logging or self.logging
+        self.spans = config.debug_spans or self.spans
+        self.profile_dir = config.profile_dir
+
+
+state = DebugState()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Adds up the time spent in named spans (build, network, parse, render) between reports.
+
+    Spans on the engine loop and the Tk thread land in the same totals, so
+    one report shows where a request's time went end to end.
+    """
+
+    def __init__(self):
+        self.totals = {}  # name -> [count, seconds]
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        return Span(self, name) if state.spans else NULL_SPAN
+
+    def add(self, name, seconds):
+        with self._lock:
+            total = self.totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    def report(self, clear=True):
+        """One line of span totals since the last report."""
+        with self._lock:
+            totals = self.totals
+            if clear:
+                self.totals = {}
+        return ", ".join(
+            f"{name} {seconds * 1000:.1f}ms" + (f" ({count}x)" if count > 1 else "")
+            for name, (count, seconds) in totals.items()
+        )
+
+
+tracer = Tracer()
+
+
+class RequestProfile:
+    """cProfile plus tracemalloc around one request, written to a report file.
+
+    cProfile only sees the thread it was enabled on (the engine loop), so
+    the Tk side shows up in the render span rather than the call stats; other
+    tasks the loop runs meanwhile (probes, compaction) are included.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.profile = cProfile.Profile()
+        self.started_tracemalloc = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.started_tracemalloc = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            print(f"Profile written to {self.write(snapshot, current, peak)}")
+        except OSError as e:
+            print(f"Could not write profile: {e}")
+        return False
+
+    def write(self, snapshot, current, peak):
+        os.makedirs(state.profile_dir, exist_ok=True)
+        path = os.path.join(state.profile_dir, time.strftime("request-%Y%m%d-%H%M%S.txt"))
+        stats = io.StringIO()
+        pstats.Stats(self.profile, stream=stats).sort_stats("cumulative").print_stats(40)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Request: {self.label}\n")
+            f.write(f"Memory: {current / 1024:.0f} KiB traced at the end, {peak / 1024:.0f} KiB peak\n")
+            f.write(f"Spans: {tracer.report(clear=False) or 'off'}\n\n")
+            f.write("Top allocations by line\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"  {stat}\n")
+            f.write("\nCall profile (engine loop thread)\n")
+            f.write(stats.getvalue())
+        return path
+
+
+def profile_request(label):
+    """Profile context for one request if one was asked for, else a no-op."""
+    if not state.profile_next:
+        return NULL_SPAN
+    state.profile_next = False  # Armed for a single request
+    return RequestProfile(label)
@@ -0,0 +1,75 @@
+import asyncio
+import queue
+import threading
+
+
+class StreamEngine:
+    """One asyncio event loop on a dedicated thread that runs all network work.
+
+    Coroutines (chat streams, latency probes, warm-ups) are handed to the loop
+    with submit() from any thread. Nothing on the loop touches Tk: results go
+    to the UI as (fn, args) calls through `events`, a single thread-safe queue
+    that the Tk side drains with pump() once per frame.
+
+    Streams are capped by a semaphore, and drain() lets a producer wait while
+    the UI has fallen behind, so a fast stream can't flood the queue.
+    """
+
+    def __init__(self, max_streams=4, high_water=2000):
+        self.high_water = high_water  # Queued UI calls before producers are slowed down
+        self.events = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.streams = asyncio.Semaphore(max_streams)  # Bound to the loop on first use
+        self._thread = threading.Thread(target=self._run, name="stream-engine", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=2.0):
+        """Cancel everything still running on the loop, then stop it (a clean exit for headless use)."""
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self.submit(shutdown()).result(timeout)
+        except Exception:
+            pass  # Whatever didn't finish in time dies with the loop
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    def call_soon(self, fn, *args):
+        """Run a plain callback on the loop thread."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def post(self, fn, *args):
+        """Queue fn(*args) to run on the Tk thread. Safe from any thread."""
+        self.events.put((fn, args))
+
+    async def drain(self):
+        """Wait until the UI has caught up with what was posted (backpressure)."""
+        while self.events.qsize() > self.high_water:
+            await asyncio.sleep(0.01)
+
+    def pump(self, limit=None):
+        """Run queued UI calls; called on the Tk thread. Returns how many ran."""
+        count = 0
+        while limit is None or count < limit:
+            try:
+                fn, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"UI callback error: {e}")
+            count += 1
+        return count
@@ -0,0 +1,144 @@
+from collections import namedtuple
+
+# kind is "text", "code", "open" or "close". Code segments and fence events carry the
+# fence language ("" when the fence has no info string).
+Segment = namedtuple("Segment", "kind text lang")
+
+
+class FenceParser:
+    """Incremental splitter of streamed markdown into text and fenced code segments.
+
+    Fences are runs of three or more backticks at the start of a line (leading
+    spaces/tabs allowed). Chunks can be cut anywhere: only the undecided part of
+    a possible fence line is held back (a backtick count, the info string or the
+    whitespace after a closing fence), so output does not depend on how the
+    response was chunked and every character is looked at a constant number of
+    times.
+    """
+
+    def __init__(self):
+        self.in_code = False
+        self.lang = ""
+        self._fence_len = 0
+        self._mode = "bol"  # bol, mid, ticks, info or closing
+        self._ticks = 0
+        self._held = []  # Info string or closing-fence whitespace seen so far
+
+    def feed(self, chunk):
+        """Consume the next chunk and return the segments it completes."""
+        out = []  # [kind, parts, lang] runs, joined once at the end
+        i, n = 0, len(chunk)
+        while i < n:
+            mode = self._mode
+            if mode == "mid":
+                nl = chunk.find("\n", i)
+                end = n if nl == -1 else nl + 1
+                self._emit(out, chunk[i:end])
+                if nl != -1:
+                    self._mode = "bol"
+                i = end
+            elif mode == "bol":
+                j = i
+                while j < n and chunk[j] in " \t":
+                    j += 1
+                if j > i:
+                    self._emit(out, chunk[i:j])  # Indentation stays content, the fence may still follow
+                    i = j
+                elif chunk[i] == "`":
+                    self._mode = "ticks"
+                    self._ticks = 0
+                else:
+                    self._mode = "mid"
+            elif mode == "ticks":
+                j = i
+                while j < n and chunk[j] == "`":
+                    j += 1
+                self._ticks += j - i
+                i = j
+                if i < n:
+                    self._resolve_ticks(out)
+            elif mode == "info":
+                nl = chunk.find("\n", i)
+                end = n if nl == -1 else nl
+                piece = chunk[i:end]
+                if "`" in piece:  # Backticks in the info string: it was inline code, not a fence
+                    self._emit(out, "`" * self._ticks + "".join(self._held))
+                    self._held = []
+                    self._mode = "mid"
+                    continue
+                self._held.append(piece)
+                i = end
+                if nl != -1:
+                    self._open(out)
+                    i = nl + 1
+            else:  # closing
+                nl = chunk.find("\n", i)
+                end = n if nl == -1 else nl
+                piece = chunk[i:end]
+                if piece.strip(" \t\r"):  # Text after the backticks: still code
+                    self._emit(out, "`" * self._ticks + "".join(self._held))
+                    self._held = []
+                    self._mode = "mid"
+                    continue
+                self._held.append(piece)
+                i = end
+                if nl != -1:
+                    self._close(out)
+                    i = nl + 1
+        return self._segments(out)
+
+    def close(self):
+        """Flush whatever is still held back once the response has ended."""
+        out = []
+        if self._mode == "ticks":
+            if not self.in_code and self._ticks >= 3:
+                self._open(out)
+            elif self.in_code and self._ticks >= self._fence_len:
+                self._close(out)
+            else:
+                self._emit(out, "`" * self._ticks)
+        elif self._mode == "info":
+            self._open(out)
+        elif self._mode == "closing":
+            self._close(out)
+        self._mode = "bol"
+        return self._segments(out)
+
+    def _resolve_ticks(self, out):
+        self._held = []
+        if not self.in_code and self._ticks >= 3:
+            self._mode = "info"
+        elif self.in_code and self._ticks >= self._fence_len:
+            self._mode = "closing"
+        else:
+            self._emit(out, "`" * self._ticks)
+            self._mode = "mid"
+
+    def _open(self, out):
+        info = "".join(self._held).split()
+        self.lang = info[0] if info else ""
+        self.in_code = True
+        self._fence_len = self._ticks
+        self._held = []
+        self._mode = "bol"
+        out.append(["open", [], self.lang])
+
+    def _close(self, out):
+        out.append(["close", [], self.lang])
+        self.in_code = False
+        self.lang = ""
+        self._held = []
+        self._mode = "bol"
+
+    def _emit(self, out, text):
+        if not text:
+            return
+        kind = "code" if self.in_code else "text"
+        if out and out[-1][0] == kind:
+            out[-1][1].append(text)
+        else:
+            out.append([kind, [text], self.lang])
+
+    @staticmethod
+    def _segments(out):
+        return [Segment(kind, "".join(parts), lang) for kind, parts, lang in out]
@@ -0,0 +1,292 @@
+import os
+import queue
+import tkinter as tk
+import tkinter.font as tkfont
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from tkinter import ttk
+
+from ignore import IgnoreRules
+
+
+class Node:
+    __slots__ = (
+        "path", "name", "is_dir", "depth", "parent", "children", "expanded", "loading", "rules", "inode", "mtime"
+    )
+
+    def __init__(self, path, name, is_dir, depth, parent=None, rules=None, inode=0):
+        self.path = path
+        self.name = name
+        self.is_dir = is_dir
+        self.depth = depth
+        self.parent = parent
+        self.children = None  # None until the directory has been scanned
+        self.expanded = False
+        self.loading = False
+        self.rules = rules  # IgnoreRules in effect inside this directory
+        self.inode = inode
+        self.mtime = None  # Directory mtime (ns) as of the last scan
+
+
+def scan_directory(node, exclude_globs, use_gitignore=True):
+    """List one directory level as child Nodes, dirs first. Safe to run off the Tk thread."""
+    node.mtime = os.stat(node.path).st_mtime_ns  # Taken first so a change during the scan is still noticed
+    rules = IgnoreRules.for_directory(node.path, node.rules) if use_gitignore else None
+    children = []
+    with os.scandir(node.path) as entries:
+        for entry in entries:
+            if any(fnmatch(entry.name, pattern) for pattern in exclude_globs):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                inode = entry.inode()
+            except OSError:
+                continue
+            if rules and rules.ignored(entry.path, is_dir):
+                continue
+            children.append(Node(entry.path, entry.name, is_dir, node.depth + 1, node, rules, inode))
+    children.sort(key=lambda child: (not child.is_dir, child.name.lower()))
+    return children
+
+
+class FileTree:
+    """File pane that scans directories lazily and only draws the rows on screen.
+
+    Each directory is listed with a single scandir on a worker thread the first
+    time it is expanded; results come back through a queue polled from the Tk
+    loop. The expanded tree is kept as a flat list of visible nodes, and the
+    Listbox only ever holds the handful of rows that fit in the pane.
+    """
+
+    def __init__(self, parent, config, on_open, on_scanned=None):
+        self.config = config
+        self.on_open = on_open
+        self.on_scanned = on_scanned  # Called with each directory node once it has been listed
+        self.root_node = None
+        self.rows = []  # Flattened visible nodes
+        self.top = 0  # Index in rows of the first drawn row
+        self.selected = None  # Index in rows of the selected node
+        self.visible = 1
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-scan")
+        self.results = queue.Queue()
+        self.pending_scans = 0
+        self.line_height = tkfont.Font(font=config.text_font).metrics("linespace")
+
+        self.frame = ttk.Frame(parent)
+        self.frame.pack(fill=tk.BOTH, expand=True)
+        self.listbox = tk.Listbox(
+            self.frame,
+            bg=config.bg_color,
+            fg=config.fg_color,
+            font=config.text_font,
+            selectbackground=config.code_bg,
+            selectforeground=config.fg_color,
+            highlightthickness=1,
+            highlightcolor=config.green_border,
+            highlightbackground=config.green_border,
+            activestyle="none",
+            exportselection=False
+        )
+        self.scrollbar = None
+        if not config.hide_scrollbars:
+            self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+            self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<Button-1>", self.on_click)
+        self.listbox.bind("<Double-Button-1>", self.on_activate)
+        self.listbox.bind("<Return>", self.on_activate)
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(3))
+
+    def set_root(self, path):
+        self.root_node = Node(path, os.path.basename(path) or path, True, -1)
+        self.rows = []
+        self.top = 0
+        self.selected = None
+        self.expand(self.root_node)
+        self.render()
+
+    # ------------------ Scanning ---------------------
+
+    def expand(self, node):
+        node.expanded = True
+        if node.children is None:
+            if not node.loading:
+                node.loading = True
+                self.pending_scans += 1
+                self.executor.submit(self._scan, node)
+                if self.pending_scans == 1:
+                    self.listbox.after(15, self.poll_results)
+            return
+        self._insert_rows(node, node.children)
+
+    def _scan(self, node):
+        try:
+            children = scan_directory(node, self.config.file_exclude_globs, self.config.respect_gitignore)
+        except OSError:
+            self.results.put((node, []))  # Unreadable directory: show it as empty
+            return
+        self.results.put((node, children))
+
+    def poll_results(self):
+        changed = False
+        while True:
+            try:
+                node, children = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_scans -= 1
+            node.loading = False
+            node.children = children
+            if not self._is_shown(node, expanded_only=False):
+                continue
+            if node.mtime is not None and self.on_scanned:
+                self.on_scanned(node)
+            if node.expanded and self._is_shown(node):
+                self._insert_rows(node, children)
+            changed = True
+        if changed:
+            self.render()
+        if self.pending_scans:
+            self.listbox.after(15, self.poll_results)
+
+    def _is_shown(self, node, expanded_only=True):
+        while node.parent is not None:
+            if expanded_only and not node.parent.expanded:
+                return False
+            node = node.parent
+        return node is self.root_node  # Scans from a previously opened folder are dropped
+
+    def apply_changes(self, node, added, removed, renamed):
+        """Patch one directory's listing with changes reported by the watcher."""
+        if node.children is None or not self._is_shown(node, expanded_only=False):
+            return
+        selected = self.rows[self.selected] if self.selected is not None else None
+        shown = node.expanded and self._is_shown(node)
+        if shown:
+            self.collapse(node)  # Drops only this directory's rows; they are re-added below
+            node.expanded = True
+
+        gone = set(removed)
+        for child in node.children:
+            new_name = renamed.get(child.name)
+            if new_name is not None:
+                child.name = new_name
+                child.path = os.path.join(node.path, new_name)
+                if child.is_dir:
+                    child.children, child.expanded = None, False  # Paths below it are stale; rescan on expand
+        children = [child for child in node.children if child.name not in gone] + added
+        children.sort(key=lambda child: (not child.is_dir, child.name.lower()))
+        node.children = children
+
+        if shown:
+            self._insert_rows(node, children)
+            self.selected = self.rows.index(selected) if selected in self.rows else None
+            self.render()
+
+    # ------------------ Row bookkeeping ---------------------
+
+    def _row_of(self, node):
+        if node is self.root_node:
+            return -1
+        return self.rows.index(node)
+
+    def _insert_rows(self, node, children):
+        flat = []
+        self._flatten(children, flat)
+        at = self._row_of(node) + 1
+        self.rows[at:at] = flat
+        if self.selected is not None and self.selected >= at:
+            self.selected += len(flat)
+
+    def _flatten(self, children, out):
+        for child in children:
+            out.append(child)
+            if child.is_dir and child.expanded and child.children:
+                self._flatten(child.children, out)
+
+    def collapse(self, node):
+        node.expanded = False
+        start = self._row_of(node) + 1
+        end = start
+        while end < len(self.rows) and self.rows[end].depth > node.depth:
+            end += 1
+        del self.rows[start:end]
+        if self.selected is not None and self.selected >= end:
+            self.selected -= end - start
+        elif self.selected is not None and self.selected >= start:
+            self.selected = start - 1
+
+    # ------------------ Drawing ---------------------
+
+    def label(self, node):
+        indent = "  " * node.depth
+        if not node.is_dir:
+            return f"{indent}  {node.name}"
+        arrow = "▾" if node.expanded else "▸"
+        return f"{indent}{arrow} {node.name}/{' …' if node.loading else ''}"
+
+    def render(self):
+        self.top = max(0, min(self.top, len(self.rows) - self.visible))
+        window = self.rows[self.top:self.top + self.visible]
+        self.listbox.delete(0, tk.END)
+        if window:
+            self.listbox.insert(tk.END, *(self.label(node) for node in window))
+        if self.selected is not None and self.top <= self.selected < self.top + self.visible:
+            self.listbox.selection_set(self.selected - self.top)
+        if self.scrollbar:
+            total = max(1, len(self.rows))
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+
+    def on_resize(self, event):
+        self.visible = max(1, event.height // max(1, self.line_height))
+        self.render()
+
+    def scroll(self, delta):
+        self.top += delta
+        self.render()
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.rows))
+        elif action == "scroll":
+            self.top += int(amount) * (self.visible if unit == "pages" else 1)
+        self.render()
+
+    def on_click(self, event):
+        index = self.top + self.listbox.nearest(event.y)
+        if index < len(self.rows):
+            self.selected = index
+            self.render()
+        self.listbox.focus_set()
+        return "break"
+
+    def move_selection(self, delta):
+        if not self.rows:
+            return "break"
+        self.selected = max(0, min(len(self.rows) - 1, (self.selected or 0) + delta))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.render()
+        return "break"
+
+    def on_activate(self, event=None):
+        if self.selected is None or self.selected >= len(self.rows):
+            return "break"
+        node = self.rows[self.selected]
+        if not node.is_dir:
+            self.on_open(node.path)
+        elif node.expanded:
+            self.collapse(node)
+        else:
+            self.expand(node)
+        self.render()
+        return "break"
@@ -0,0 +1,57 @@
+import sys
+
+from conversation import Conversation
+
+
+class NullHighlighter:
+    """Code block highlighter for front ends that don't colour code."""
+
+    def begin(self):
+        return None
+
+    def submit(self, mark, code, lang):
+        pass
+
+
+class Frontend:
+    """What APIHandler needs from whatever shows the chat: the GUI, the CLI or the benchmark.
+
+    APIHandler only reads and writes the attributes below and calls the hooks
+    through the stream engine's UI queue, so a front end is free to decide
+    what "showing" means. `renderer` needs write(text, tag), mark(name) and
+    call(fn, *args), like StreamRenderer.
+    """
+
+    def __init__(self, config, conversation=None):
+        self.config = config
+        self.conversation = conversation or Conversation()
+        self.renderer = None
+        self.code_highlighter = NullHighlighter()
+        self.active_request = False
+        self.stream_start_time = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.request_cost = 0.0
+        self.session_cost = 0.0
+        self.trimmed_messages = 0  # Older messages left out of the last request to fit the context window
+        self.summarised_messages = 0  # Older messages sent as a compaction summary instead
+        self.cache_stats = None  # (hits, lookups) of the response cache, None while it is off
+        self.retrieved_chunks = 0  # Project excerpts added to the last request
+        self.last_trace = None  # RequestTrace of the last reply
+        self.route_note = ""  # Latest routing decision (retry/failover) of the request in flight
+        self.current_directory = None  # Folder retrieval excerpts are taken from
+
+    def update_display(self, text, tag=None):
+        self.renderer.write(text, tag)
+
+    def manage_thinking_animation(self, state=None):
+        pass
+
+    def show_error(self, message):
+        print(message, file=sys.stderr)
+
+    def show_route(self, note):
+        self.route_note = note
+
+    def update_status(self):
+        pass
@@ -1,95 +1,52 @@
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import tkinter as tk
-import threading
 import time
-from pygments import lex
-from pygments.lexers import get_lexer_by_name
-from pygments.token import Token
 from config import Config  # Ensure correct import
 from api import APIHandler  # Ensure correct import
+from conversation import Conversation
+from frontend import Frontend
+from render import StreamRenderer
+from highlighter import SyntaxHighlighter, CodeBlockHighlighter
+from lexers import lexer_for_filename, lexer_by_name
+from largefile import LargeFileViewer, detect_encoding
+from filetree import FileTree
+from watcher import FolderWatcher
+from sessions import SessionStore
+from fences import FenceParser
+from compare import ComparisonWindow, ask_models
+from statspanel import StatsWindow
+import debug
 import os
 import re
 
-from pygments.lexers import get_lexer_by_name
-from pygments import lex
-from pygments.token import Token
-
-class SyntaxHighlighter:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-        self.lexer = get_lexer_by_name("python")  # Default to Python
-        self.setup_tags()  # Configure tags upfront
-        self.bind_events()
-
-    def setup_tags(self):
-        """Define and configure tags for syntax highlighting."""
-        self.text_widget.tag_configure("keyword", foreground="#FF0000")  # Red
-        self.text_widget.tag_configure("function", foreground="#0000FF")  # Blue
-        self.text_widget.tag_configure("string", foreground="#00AA00")  # Green
-        self.text_widget.tag_configure("comment", foreground="#888888")  # Gray
-        self.text_widget.tag_configure("number", foreground="#AA00AA")  # Purple
-
-    def bind_events(self):
-        """Bind events for typing, pasting, and content changes."""
-        self.text_widget.bind("<KeyRelease>", lambda e: self.highlight())
-        self.text_widget.bind("<<Paste>>", lambda e: self.text_widget.after(10, self.highlight))
-
-    def highlight(self):
-        """Apply syntax highlighting to the entire content."""
-        code = self.text_widget.get("1.0", "end-1c")
-        if not code.strip():
-            return  # Skip empty content
-
-        # Clear existing tags
-        for tag in self.text_widget.tag_names():
-            self.text_widget.tag_remove(tag, "1.0", "end")
-
-        # Tokenize and highlight
-        start_pos = "1.0"
-        for token, content in lex(code, self.lexer):
-            if not content:
-                continue  # Skip empty tokens
-            end_pos = f"{start_pos}+{len(content)}c"
-            self.apply_highlight(token, content, start_pos, end_pos)
-            start_pos = end_pos  # Update position for next token
-
-    def apply_highlight(self, token, content, start_pos, end_pos):
-        """Apply highlighting for a single token."""
-        if token in Token.Keyword:
-            self.text_widget.tag_add("keyword", start_pos, end_pos)
-        elif token in Token.Name.Function:
-            self.text_widget.tag_add("function", start_pos, end_pos)
-        elif token in Token.String:
-            self.text_widget.tag_add("string", start_pos, end_pos)
-        elif token in Token.Comment:
-            self.text_widget.tag_add("comment", start_pos, end_pos)
-        elif token in Token.Number:
-            self.text_widget.tag_add("number", start_pos, end_pos)
-
-class EmoChatGUI:
+class EmoChatGUI(Frontend):
     def __init__(self, root):
         self.root = root
         self.root.title("EmoChat IDE")  # Update title
         self.root.geometry("1200x800")  # Increase size
-        self.messages = []
-        self.current_response = ""
-        self.code_parse_buffer = ""
-        self.in_code_block = False
+        config = Config()
+        config.bind_tk(self.root)
+        super().__init__(config, Conversation(on_commit=self.persist_message))
         self.thinking_animation = False
-        self.active_request = False
-        self.stream_start_time = 0
-        self.input_tokens = 0
-        self.output_tokens = 0
-        self.config = Config()
         self.root.configure(bg=self.config.bg_color)
         self.loading_frames = iter(self.config.loading_frames_list * 1000)
         self.kaomoji_waves = iter(self.config.kaomojis_list * 1000)
         self.api_handler = APIHandler(self)
         self.current_directory = None  # Store current directory
         self.current_file_path = None #Store the current file path
+        self.watcher = FolderWatcher(self.config, self.config.watch_interval)
+        self.sessions = SessionStore(self.config.session_store_path)
+        self.session_id = None
+        self.oldest_loaded_seq = 0  # Messages before this are still only on disk
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.setup_ui()
         self.setup_keybindings()
+        self.restore_session()
+        self.api_handler.watch_endpoints()
+        self.api_handler.warm_up()
         self.update_info_box()
+        self.poll_watcher()
+        self.pump_events()
 
     def setup_ui(self):
         style = ttk.Style()
@@ -121,19 +78,7 @@ class EmoChatGUI:
         self.file_pane = ttk.Frame(content_frame)
         content_frame.add(self.file_pane, weight=1)  # Leftmost pane (3/6 = 50%)
 
-        self.file_list = tk.Listbox(
-            self.file_pane,
-            bg=self.config.bg_color,
-            fg=self.config.fg_color,
-            font=self.config.text_font,
-            selectbackground=self.config.code_bg,
-            selectforeground=self.config.fg_color,
-            highlightthickness=1,
-            highlightcolor=self.config.green_border,
-            highlightbackground=self.config.green_border
-        )
-        self.file_list.pack(fill=tk.BOTH, expand=True)
-        self.file_list.bind("<Double-Button-1>", self.open_file)
+        self.file_tree = FileTree(self.file_pane, self.config, self.open_file, on_scanned=self.watcher.watch)
 
         # ------------------ File Editor ---------------------
         self.editor_pane = ttk.Frame(content_frame)
@@ -161,6 +106,7 @@ class EmoChatGUI:
 
         # Initialize syntax highlighting
         self.highlighter = SyntaxHighlighter(self.file_content)
+        self.large_file_viewer = LargeFileViewer(self.file_content, on_progress=self.show_index_progress)
 
         # ------------------ Chat Display ---------------------
         self.chat_pane = ttk.Frame(content_frame)
@@ -183,9 +129,40 @@ class EmoChatGUI:
             highlightcolor=self.config.green_border,
             highlightbackground=self.config.green_border
         )
-        self.chat_display.pack(fill=tk.BOTH, expand=True)
+        self.search_frame = tk.Frame(self.chat_pane, bg=self.config.bg_color)  # Shown with Ctrl+F
+        search_bar = tk.Frame(self.search_frame, bg=self.config.bg_color)
+        search_bar.pack(fill=tk.X)
+        self.search_entry = tk.Entry(
+            search_bar, bg=self.config.bg_color, fg=self.config.fg_color, insertbackground=self.config.fg_color,
+            font=self.config.text_font, relief="flat", highlightthickness=1,
+            highlightcolor=self.config.green_border, highlightbackground=self.config.green_border
+        )
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_code_only = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            search_bar, text="code only", variable=self.search_code_only, command=self.run_search,
+            bg=self.config.bg_color, fg=self.config.fg_color, selectcolor=self.config.code_bg,
+            activebackground=self.config.bg_color, activeforeground=self.config.fg_color, font=self.config.text_font
+        ).pack(side=tk.LEFT, padx=5)
+        self.search_results = tk.Listbox(
+            self.search_frame, height=6, bg=self.config.bg_color, fg=self.config.fg_color,
+            font=self.config.text_font, selectbackground=self.config.code_bg, relief="flat",
+            highlightthickness=1, highlightcolor=self.config.green_border,
+            highlightbackground=self.config.green_border, activestyle="none"
+        )
+        self.search_results.pack(fill=tk.X)
+        self.search_hits = []
+        self.search_entry.bind("<Return>", self.run_search)
+        self.search_entry.bind("<Escape>", lambda e: self.toggle_search())
+        self.search_entry.bind("<Down>", lambda e: (self.search_results.focus_set(), self.search_results.selection_set(0)))
+        self.search_results.bind("<Double-Button-1>", self.open_search_hit)
+        self.search_results.bind("<Return>", self.open_search_hit)
+        self.search_results.bind("<Escape>", lambda e: self.toggle_search())
 
-        #self.highlighter = SyntaxHighlighter(self.chat_display)
+        self.chat_display.pack(fill=tk.BOTH, expand=True)
+        self.renderer = StreamRenderer(self.chat_display, fps=self.config.render_fps)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Prior>", "<Control-Home>"):
+            self.chat_display.bind(sequence, lambda e: self.root.after_idle(self.load_older_messages), add="+")
 
 
         # ------------------ Status Box setup ---------------------
@@ -212,7 +189,7 @@ class EmoChatGUI:
             state="readonly", width=15, font=self.config.text_font
         )
         self.model_selector.grid(row=0, column=3, sticky="w")
-        self.model_selector.bind("<<ComboboxSelected>>", lambda e: self.config.model.set(self.model_selector.get()))
+        self.model_selector.bind("<<ComboboxSelected>>", self.on_model_selected)
 
         # -------NEW prompt box setup--------
         input_frame = ttk.Frame(main_frame, style="Main.TFrame")
@@ -248,16 +225,238 @@ class EmoChatGUI:
         self.bottom_status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.configure_text_tags()
+        self.code_highlighter = CodeBlockHighlighter(self.renderer, self.api_handler.engine.post)  # After the base tags so its colours win
+
+    def on_model_selected(self, event=None):
+        self.config.model.set(self.model_selector.get())
+        self.api_handler.watch_endpoints()
+        self.api_handler.warm_up()
 
     def create_menu_bar(self):
         menu_bar = tk.Menu(self.root)
         file_menu = tk.Menu(menu_bar, tearoff=0)
         file_menu.add_command(label="Open Folder", command=self.open_folder)
         file_menu.add_separator() # Adds dividing line
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.on_close)  # Flushes the session store first
         menu_bar.add_cascade(label="File", menu=file_menu)
+        chat_menu = tk.Menu(menu_bar, tearoff=0)
+        chat_menu.add_command(label="Pin Last Exchange", command=self.pin_last_exchange)
+        chat_menu.add_command(label="Unpin All", command=self.unpin_all)
+        chat_menu.add_separator()
+        chat_menu.add_command(label="Compare Models...", command=self.compare_models)
+        chat_menu.add_command(label="Request Stats...", command=self.show_stats)
+        menu_bar.add_cascade(label="Chat", menu=chat_menu)
+        debug_menu = tk.Menu(menu_bar, tearoff=0)
+        self.debug_logging = tk.BooleanVar(value=debug.state.logging)
+        self.debug_spans = tk.BooleanVar(value=debug.state.spans)
+        debug_menu.add_checkbutton(label="Debug Logging", variable=self.debug_logging, command=self.toggle_debug)
+        debug_menu.add_checkbutton(label="Span Tracing", variable=self.debug_spans, command=self.toggle_debug)
+        debug_menu.add_command(label="Profile Next Request", command=self.profile_next_request)
+        menu_bar.add_cascade(label="Debug", menu=debug_menu)
         self.root.config(menu=menu_bar)
 
+    def pin_last_exchange(self):
+        pinned = self.conversation.pin_last_turn()
+        if pinned:
+            self.sessions.set_pinned(self.session_id, [message.seq for message in pinned])
+            self.bottom_status_bar.config(text="⚡️ (^_^)b Last exchange pinned: it stays in context when old turns are trimmed")
+
+    def unpin_all(self):
+        self.conversation.unpin_all()
+        self.sessions.unpin_all(self.session_id)
+        self.bottom_status_bar.config(text="⚡️ (^_^) All messages unpinned")
+
+    def compare_models(self):
+        """Send the typed message to several models at once and show their replies side by side."""
+        user_text = self.user_input.get("1.0", tk.END).strip()
+        if not user_text:
+            self.bottom_status_bar.config(text="⚡️ (・_・)? Type a message first, then compare models")
+            return
+
+        def send(names):
+            self.user_input.delete(1.0, tk.END)
+            window = ComparisonWindow(self.root, self.config, user_text, names, self.keep_reply)
+            window.future = self.api_handler.fan_out(user_text, names, window)
+
+        ask_models(self.root, self.config, send)
+
+    def toggle_debug(self):
+        debug.state.logging = self.debug_logging.get()
+        debug.state.spans = self.debug_spans.get()
+
+    def profile_next_request(self):
+        debug.state.profile_next = True
+        self.bottom_status_bar.config(text=f"⚡️ (•̀ᴗ•́)و The next request will be profiled into {debug.state.profile_dir}/")
+
+    def show_stats(self):
+        StatsWindow(self.root, self.config, self.api_handler.telemetry)
+
+    def keep_reply(self, user_text, reply):
+        """Continue the chat with a reply picked in a comparison window."""
+        if self.active_request or self.api_handler.scheduler.pending:
+            self.bottom_status_bar.config(text="⚡️ (._.) Wait for the current reply before keeping a compared one")
+            return False
+        for message in (self.conversation.add("user", user_text), self.conversation.add("assistant", reply)):
+            self.renderer.mark(f"msg{message.seq}")
+            for text, tag in self.message_segments(message):
+                self.renderer.write(text, tag)
+        return True
+
+    # ------------------ Sessions ---------------------
+
+    def restore_session(self):
+        """Reopen the last session, loading only its tail; older messages load on scroll-up."""
+        session_id = self.sessions.last_session() if self.config.restore_last_session else None
+        if session_id is None:
+            self.session_id = self.sessions.new_session()
+            return
+        self.open_session(session_id)
+
+    def open_session(self, session_id):
+        """Show a stored session and continue it; only its tail is read from disk."""
+        self.renderer.discard()
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.delete(1.0, tk.END)
+        self.chat_display.config(state=tk.DISABLED)
+        for mark in self.chat_display.mark_names():
+            if mark.startswith("msg"):
+                self.chat_display.mark_unset(mark)
+        self.session_id = session_id
+        stored = self.sessions.load(session_id, limit=self.config.session_tail_messages)
+        self.conversation.load(stored)
+        self.api_handler.reset()
+        self.oldest_loaded_seq = stored[0].seq if stored else 0
+        for message in stored:
+            self.renderer.mark(f"msg{message.seq}")
+            for text, tag in self.message_segments(message):
+                self.renderer.write(text, tag)
+
+    def persist_message(self, message):
+        """Conversation commit hook; runs on the engine loop and only queues the write."""
+        self.sessions.append(self.session_id, message)
+
+    def message_segments(self, message):
+        """(text, tag) runs that show a stored message the way it looked when it streamed in."""
+        if message.role == "user":
+            return [(f"\n>: {message.content}\n", "user")]
+        parser = FenceParser()
+        segments = parser.feed(message.content) + parser.close()
+        runs = [("\n> ", "assistant")]
+        runs.extend((segment.text, "assistant" if segment.kind == "text" else "code")
+                    for segment in segments if segment.kind in ("text", "code"))
+        return runs
+
+    def load_older_messages(self, force=False):
+        """Prepend a page of older messages once the chat view is scrolled to the top.
+
+        They are shown only; the request context is built from the messages loaded
+        at start-up and those that came after. Returns False when there is nothing older.
+        """
+        if self.oldest_loaded_seq <= 0:
+            return False
+        if not force and self.chat_display.yview()[0] > 0:
+            return True
+        older = self.sessions.load(self.session_id, before=self.oldest_loaded_seq,
+                                   limit=self.config.session_tail_messages)
+        if not older:
+            self.oldest_loaded_seq = 0
+            return False
+        self.oldest_loaded_seq = older[0].seq
+        widget = self.chat_display
+        widget.mark_set("previous_top", "1.0")
+        widget.mark_gravity("previous_top", tk.RIGHT)  # Moves past each insert, so messages stay in order
+        widget.config(state=tk.NORMAL)
+        for message in older:
+            mark = f"msg{message.seq}"
+            widget.mark_set(mark, "previous_top")
+            widget.mark_gravity(mark, tk.LEFT)
+            args = []
+            for text, tag in self.message_segments(message):
+                args.extend((text, tag))
+            widget.insert("previous_top", *args)
+        widget.config(state=tk.DISABLED)
+        widget.yview("previous_top")  # Keep what the user was looking at in place
+        widget.mark_unset("previous_top")
+        return True
+
+    # ------------------ Search ---------------------
+
+    def toggle_search(self):
+        if self.search_frame.winfo_ismapped():
+            self.search_frame.pack_forget()
+            self.user_input.focus_set()
+        else:
+            self.search_frame.pack(fill=tk.X, before=self.chat_display)
+            self.search_entry.focus_set()
+            self.search_entry.select_range(0, tk.END)
+        return "break"
+
+    def run_search(self, event=None):
+        query = self.search_entry.get().strip()
+        self.search_hits = self.sessions.search(query, self.search_code_only.get()) if query else []
+        self.search_results.delete(0, tk.END)
+        terms = query.lower().split()
+        for hit in self.search_hits:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit.created))
+            here = "" if hit.session_id == self.session_id else " (other chat)"
+            self.search_results.insert(tk.END, f"{when}{here} {hit.role}: {self.snippet(hit.content, terms)}")
+        if not self.search_hits:
+            self.search_results.insert(tk.END, "No matches" if query else "")
+        return "break"
+
+    @staticmethod
+    def snippet(content, terms, width=80):
+        lowered = content.lower()
+        at = min((i for i in (lowered.find(term) for term in terms) if i >= 0), default=0)
+        start = max(0, at - width // 4)
+        return " ".join(content[start:start + width].split())
+
+    def open_search_hit(self, event=None):
+        selection = self.search_results.curselection()
+        if not selection or selection[0] >= len(self.search_hits):
+            return "break"
+        hit = self.search_hits[selection[0]]
+        if hit.session_id != self.session_id:
+            if self.active_request:
+                self.bottom_status_bar.config(text="⚡️ (._.) Finish or cancel the reply before opening another chat")
+                return "break"
+            self.open_session(hit.session_id)
+            self.run_search()  # Refresh the "(other chat)" labels
+        while hit.seq < self.oldest_loaded_seq and self.load_older_messages(force=True):
+            pass
+        self.renderer.flush()  # Marks of a freshly opened session are only placed when drawn
+        self.jump_to(hit.seq, self.search_entry.get().split(), self.search_code_only.get())
+        return "break"
+
+    def jump_to(self, seq, terms, code_only=False):
+        """Scroll chat_display to a message and highlight the first search term in it."""
+        widget = self.chat_display
+        mark = f"msg{seq}"
+        if mark not in widget.mark_names():
+            return
+        widget.tag_remove("search_hit", "1.0", tk.END)
+        following = [m for m in widget.mark_names() if m.startswith("msg") and widget.compare(m, ">", mark)]
+        stop = min(following, key=lambda m: tuple(map(int, widget.index(m).split("."))), default=None)
+        stop = widget.index(stop) if stop else tk.END
+        start = widget.index(mark)
+        for term in (term.strip('"*') for term in terms):
+            index = start
+            while term:
+                index = widget.search(term, index, stopindex=stop, nocase=True)
+                if not index:
+                    break
+                if not code_only or "code" in widget.tag_names(index):
+                    widget.tag_add("search_hit", index, f"{index}+{len(term)}c")
+                    widget.see(index)
+                    return
+                index = f"{index}+1c"
+        widget.yview(mark)
+
+    def on_close(self):
+        self.sessions.flush()  # Don't lose the last reply to an unfinished write
+        self.api_handler.retriever.stop()
+        self.root.destroy()
+
     def open_folder(self):
         directory = filedialog.askdirectory(initialdir=".", title="Select Directory")
         if directory:
@@ -265,59 +464,70 @@ class EmoChatGUI:
             self.populate_file_list()
 
     def populate_file_list(self):
-        self.file_list.delete(0, tk.END)
-        if not self.current_directory:
-            return
-
+        if self.current_directory:
+            self.watcher.reset()
+            self.file_tree.set_root(self.current_directory)
+            self.watcher.start()
+            if self.config.retrieval_enabled:
+                self.api_handler.retriever.set_root(self.current_directory)
+
+    def poll_watcher(self):
+        changed = []
+        while not self.watcher.changes.empty():
+            change = self.watcher.changes.get_nowait()
+            if change[0] == "dir":
+                node, added, removed, renamed = change[1:]
+                self.file_tree.apply_changes(node, added, removed, renamed)
+                changed += [child.path for child in added]
+                changed += [os.path.join(node.path, name) for name in removed + list(renamed) + list(renamed.values())]
+            else:
+                changed.append(change[1])
+                if change[1] == self.current_file_path:
+                    self.on_file_changed_on_disk()
+        self.api_handler.retriever.refresh(changed)
+        self.root.after(500, self.poll_watcher)
+
+    def on_file_changed_on_disk(self):
+        name = os.path.basename(self.current_file_path)
+        if not os.path.exists(self.current_file_path):
+            self.bottom_status_bar.config(text=f"⚡️ (°ロ°) {name} was deleted on disk")
+        elif self.large_file_viewer.active:
+            self.large_file_viewer.reload()
+        elif self.file_content.edit_modified():
+            self.bottom_status_bar.config(text=f"⚡️ (°ロ°) {name} changed on disk (you have unsaved edits here)")
+        else:
+            view = self.file_content.yview()[0]
+            insert = self.file_content.index(tk.INSERT)
+            self.open_file(self.current_file_path)
+            self.file_content.yview_moveto(view)
+            self.file_content.mark_set(tk.INSERT, insert)
+            self.bottom_status_bar.config(text=f"⚡️ !(^_^) Reloaded {name}, it changed on disk")
+
+    def open_file(self, filepath):
         try:
-            for root, dirs, files in os.walk(self.current_directory):
-                # Calculate the indentation level based on directory depth
-                level = root.replace(self.current_directory, '').count(os.sep)
-                indent = '  ' * level
-
-                # Insert the current directory (if not the root)
-                if level > 0:
-                    dir_name = os.path.basename(root)
-                    self.file_list.insert(tk.END, f"{indent}{dir_name}/")
-
-                # Insert files in the current directory
-                for file in files:
-                    self.file_list.insert(tk.END, f"{indent}{file}")
-
+            size = os.path.getsize(filepath)
+            self.large_file_viewer.close()
+            if size > self.config.large_file_threshold_mb * 1024 * 1024:
+                self.highlighter.set_lexer(lexer_by_name("text"))  # Read-only window: no highlighting
+                self.large_file_viewer.open(filepath)
+            else:
+                with open(filepath, "rb") as f:  # Open the file with error handling
+                    data = f.read()
+                content = data.decode(detect_encoding(data[:65536]), errors="replace")
+                self.highlighter.set_lexer(lexer_for_filename(filepath))
+                self.file_content.delete(1.0, tk.END)
+                self.file_content.insert(1.0, content)
+            self.file_content.edit_modified(False)
+            self.current_file_path = filepath
+            self.watcher.watch_file(filepath)
+            self.watcher.start()
         except OSError as e:
-            messagebox.showerror("Error", f"Could not read directory:\n{e}")
+            messagebox.showerror("Error", f"Could not open/read file:\n{e}")
 
-    def open_file(self, event):
-        if not self.current_directory:
-            return
-        selection = self.file_list.curselection()
-        if selection:
-            # Get the displayed filename and clean it
-            displayed_name = self.file_list.get(selection[0])
-            
-            # Remove indentation and icons
-            clean_name = displayed_name.lstrip().replace("📁 ", "").replace("📄 ", "")
-            
-            # Handle directory paths (ending with /)
-            if clean_name.endswith("/"):
-                clean_name = clean_name[:-1]
-            
-            filepath = os.path.join(self.current_directory, clean_name)
-            
-            try:
-                if os.path.isdir(filepath):
-                    # Don't try to open directories
-                    return
-                
-                with open(filepath, "r") as f:  # Open the file with error handling
-                    content = f.read()  # Read file contents safely
-                    self.file_content.delete(1.0, tk.END)
-                    self.file_content.insert(1.0, content)
-                    self.current_file_path = filepath
-            except OSError as e:
-                messagebox.showerror("Error", f"Could not open/read file:\n{e}")
-            except UnicodeDecodeError as e:
-                messagebox.showerror("Error", f"Could not decode file:\n{e}")
+    def show_index_progress(self, lines, done):
+        name = os.path.basename(self.current_file_path or "")
+        state = "read-only" if done else "indexing…"
+        self.bottom_status_bar.config(text=f"⚡️ !(^_^) {name}: {lines:,} lines ({state}, large-file mode)")
 
     def send_selected_text(self, event):
         try:
@@ -334,7 +544,8 @@ class EmoChatGUI:
             "kaomoji": {"foreground": self.config.kaomoji_color},
             "error": {"foreground": "#f44336"},
             "loading_text": {"foreground": self.config.loading_color},
-            "status": {"foreground": self.config.fg_color}
+            "status": {"foreground": self.config.fg_color},
+            "search_hit": {"background": self.config.green_border, "foreground": self.config.bg_color}
         }
         for tag, config in tags.items():
             for widget in (self.chat_display, self.thinking_animation_box, self.network_info_box):
@@ -405,32 +616,51 @@ class EmoChatGUI:
     def setup_keybindings(self):
         print("Setting up keybindings")
         self.root.bind("<Alt_R>", lambda e: self.clear_output())
+        self.root.bind("<Escape>", lambda e: self.cancel_request())
+        self.root.bind("<Shift-Escape>", lambda e: self.cancel_request(drop_queued=True))
+        self.root.bind("<Control-f>", lambda e: self.toggle_search())
         self.root.bind("<Return>", lambda e: self.send_message() if not (e.state & 0x0001) else None)
         self.user_input.bind("<Shift-Return>", lambda e: self.user_input.insert(tk.INSERT, "\n"))
         self.user_input.bind("<KeyRelease>", self.adjust_input_height)
         self.user_input.focus_set()
 
     def clear_output(self):
+        """Start a new chat; the old session stays on disk."""
+        self.api_handler.clear(self.sessions.new_session(), self.chat_cleared)
+        return "break"
+
+    def chat_cleared(self):
+        """Wipe the view once the loop has cleared the conversation (see APIHandler.clear)."""
+        self.renderer.discard()
         self.chat_display.config(state=tk.NORMAL)
         self.chat_display.delete(1.0, tk.END)
         self.chat_display.config(state=tk.DISABLED)
-        self.messages = []
-        self.current_response = ""
+        for mark in self.chat_display.mark_names():
+            if mark.startswith("msg"):
+                self.chat_display.mark_unset(mark)
+        self.oldest_loaded_seq = 0
         self.input_tokens = 0
         self.output_tokens = 0
+        self.request_cost = 0.0
+        self.session_cost = 0.0
+        self.trimmed_messages = 0
+        self.summarised_messages = 0
         self.bottom_status_bar.config(text="⚡️ !(^_^) Chat cleared! Ready for a new convo!")
         self.root.after(3000, self.update_status)
-        return "break"
 
     def adjust_input_height(self, event):
         lines = self.user_input.get("1.0", "end-1c").count("\n") + 1
         self.user_input.configure(height=min(max(lines, 3), 8))
 
+    def pump_events(self):
+        """Apply what the stream engine posted since the last frame, then draw it."""
+        self.api_handler.engine.pump()
+        self.renderer.flush()
+        self.root.after(max(1, int(self.renderer.frame_interval * 1000)), self.pump_events)
+
     def update_display(self, text, tag=None):
-        self.chat_display.config(state=tk.NORMAL)
-        self.chat_display.insert(tk.END, text, tag)
-        self.chat_display.yview(tk.END)
-        self.chat_display.config(state=tk.DISABLED)
+        """Queue text for the chat view; drawn on the next frame."""
+        self.renderer.write(text, tag)
 
     def manage_thinking_animation(self, state=None):
         if state == "start":
@@ -471,25 +701,47 @@ class EmoChatGUI:
             self.manage_thinking_animation()
 
     def send_message(self):
-        if self.active_request:
-            return "break"
         user_text = self.user_input.get("1.0", tk.END).strip()
         if not user_text:
             return "break"
-        self.active_request = True
         self.user_input.delete(1.0, tk.END)
-        self.update_display(f"\n>: {user_text}\n", "user")
-        self.manage_thinking_animation("start")
-        threading.Thread(target=self.api_handler.process_request, args=(user_text,)).start()
+        ahead = self.api_handler.submit(user_text)
+        if ahead:
+            self.bottom_status_bar.config(text=f"⚡️ !(^_^) Queued, {ahead} request(s) ahead (Esc cancels the current reply)")
+        return "break"
+
+    def cancel_request(self, drop_queued=False):
+        if not self.active_request:
+            return "break"
+        self.api_handler.cancel(drop_queued)
+        queued = "" if drop_queued else f", {self.api_handler.scheduler.pending} still queued"
+        self.bottom_status_bar.config(text=f"⚡️ (._.) Reply cancelled{queued}")
         return "break"
 
     def update_status(self):
         elapsed = time.time() - self.stream_start_time
         total_context_tokens = self.input_tokens + self.output_tokens
-        self.bottom_status_bar.config(text=f"⚡️ !(^_^) Tokens: {self.input_tokens} in / {self.output_tokens} out "
-                                   f"(Total: {total_context_tokens}) | Response time: {elapsed:.2f}s | "
+        trimmed = f" ({self.trimmed_messages} old msgs trimmed)" if self.trimmed_messages else ""
+        if self.summarised_messages:
+            trimmed += f" ({self.summarised_messages} summarised)"
+        cache = f"Project context: {self.retrieved_chunks} excerpt(s) | " if self.retrieved_chunks else ""
+        trace = self.last_trace
+        speed = f"TTFT {trace.ttft:.2f}s, {trace.tokens_per_second:.0f} tok/s | " if trace and trace.ttft is not None else ""
+        if self.route_note:
+            cache += f"Route: {self.route_note} | "
+        if self.cache_stats:
+            hits, lookups = self.cache_stats
+            cache += f"Cache: {hits}/{lookups} hits ({hits / lookups:.0%}) | "
+        self.bottom_status_bar.config(text=f"⚡️ !(^_^) Tokens: {self.input_tokens} in{trimmed} / {self.output_tokens} out "
+                                   f"(Total: {total_context_tokens}) | Cost: ${self.request_cost:.4f} "
+                                   f"(session ${self.session_cost:.4f}) | {cache}{speed}Response time: {elapsed:.2f}s | "
                                    f"WITH <3 EMO PUNK CAT =⩊=")
 
+    def show_route(self, note):
+        """Routing decision made by the API handler (retry, failover), shown straight away."""
+        self.route_note = note
+        self.bottom_status_bar.config(text=f"⚡️ (・_・)> {note}")
+
     def show_error(self, message):
         print(f"Showing error: {message}")
         self.root.after(0, lambda: messagebox.showerror("Error", message))
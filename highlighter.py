@@ -0,0 +1,338 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pygments.lexer import ExtendedRegexLexer, RegexLexer
+from pygments.token import Token, Error, Whitespace, _TokenType
+
+from lexers import lexer_by_name
+
+# Tag name -> token type it colours. Order matters: first match wins.
+TOKEN_TAGS = (
+    ("keyword", Token.Keyword),
+    ("function", Token.Name.Function),
+    ("string", Token.String),
+    ("comment", Token.Comment),
+    ("number", Token.Number),
+)
+_tag_cache = {}
+
+
+def tag_for(token):
+    """Highlight tag for a Pygments token type, or None if it is left uncoloured."""
+    try:
+        return _tag_cache[token]
+    except KeyError:
+        tag = next((name for name, parent in TOKEN_TAGS if token in parent), None)
+        _tag_cache[token] = tag
+        return tag
+
+
+def setup_tags(widget):
+    """Define and configure tags for syntax highlighting."""
+    widget.tag_configure("keyword", foreground="#FF0000")  # Red
+    widget.tag_configure("function", foreground="#0000FF")  # Blue
+    widget.tag_configure("string", foreground="#00AA00")  # Green
+    widget.tag_configure("comment", foreground="#888888")  # Gray
+    widget.tag_configure("number", foreground="#AA00AA")  # Purple
+    for tag, _ in TOKEN_TAGS:
+        widget.tag_raise(tag)  # Win over base tags such as the chat's "code" colours
+
+
+def resumable(lexer):
+    """Whether lex_with_states can drive lexer. ExtendedRegexLexer callbacks need a LexerContext it doesn't pass."""
+    return isinstance(lexer, RegexLexer) and not isinstance(lexer, ExtendedRegexLexer)
+
+
+def lex_with_states(lexer, text, stack=("root",)):
+    """RegexLexer.get_tokens_unprocessed that also reports resumable lexer states.
+
+    Yields (pos, token, value) like Pygments, plus (pos, None, stack) whenever a
+    token ends exactly at the start of a line. Lexing can be restarted at that
+    position with that stack and will produce the same tokens, which is what
+    makes incremental re-highlighting possible.
+    """
+    pos = 0
+    tokendefs = lexer._tokens
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    last_checkpoint = 0
+    while True:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        yield pos, action, m.group()
+                    else:
+                        yield from action(lexer, m)
+                pos = m.end()
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == "#pop":
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == "#push":
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == "#push":
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+        else:
+            try:
+                if text[pos] == "\n":
+                    statestack = ["root"]  # Same EOL recovery as Pygments
+                    statetokens = tokendefs["root"]
+                    yield pos, Whitespace, "\n"
+                    pos += 1
+                else:
+                    yield pos, Error, text[pos]
+                    pos += 1
+                    continue
+            except IndexError:
+                break
+        if pos > last_checkpoint and text[pos - 1] == "\n":
+            last_checkpoint = pos
+            yield pos, None, tuple(statestack)
+
+
+class SyntaxHighlighter:
+    """Incremental Pygments highlighting for a Text widget.
+
+    Every insert/delete on the widget is intercepted to learn which lines
+    changed. After a short idle delay the highlighter re-lexes from the last
+    stable lexer state at or before the first edited line and stops as soon as
+    the state at a line start matches what it was before the edit, so the work
+    per keystroke does not grow with the file size. Tags are applied with one
+    tag add call per tag type.
+    """
+
+    WINDOW = 300  # Lines lexed per idle slice
+
+    def __init__(self, text_widget, lexer=None, delay=40):
+        self.text_widget = text_widget
+        self.lexer = lexer or lexer_by_name("python")  # Default to Python
+        self.delay = delay
+        self.states = [None, ("root",)]  # states[n]: lexer stack at the start of line n, None if unknown
+        self.dirty_start = None  # First line needing a re-lex
+        self.dirty_end = 0  # Last edited line; states past it can be reused once lexing converges
+        self._window = self.WINDOW
+        self._job = None
+        self.setup_tags()  # Configure tags upfront
+        self._install_proxy()
+
+    def setup_tags(self):
+        setup_tags(self.text_widget)
+
+    def set_lexer(self, lexer):
+        self.lexer = lexer
+        self.highlight()
+
+    def highlight(self):
+        """Schedule a re-highlight of the entire content."""
+        self.states = [None, ("root",)]
+        self._mark_dirty(1, self._last_line())
+
+    def _install_proxy(self):
+        # Route the widget's Tcl command through us so every modification is seen,
+        # whether it comes from typing, pasting or code.
+        widget = self.text_widget
+        self._orig = widget._w + "_orig"
+        widget.tk.call("rename", widget._w, self._orig)
+        widget.tk.createcommand(widget._w, self._dispatch)
+
+    def _call(self, *args):
+        return self.text_widget.tk.call((self._orig,) + args)
+
+    def _dispatch(self, command, *args):
+        if command not in ("insert", "delete", "replace"):
+            return self._call(command, *args)
+
+        before = self._last_line()
+        start = self._call("index", args[0])
+        if command == "insert" and start == self._call("index", "end"):
+            start = self._call("index", "end-1c")  # Tk inserts before the final newline
+        line = int(start.split(".")[0])
+        if command == "replace":
+            stop_line = int(self._call("index", args[1]).split(".")[0])
+            spanned = max(0, min(stop_line, before) - line)
+
+        result = self._call(command, *args)
+        delta = self._last_line() - before
+        if command == "delete" and len(args) > 2:
+            removed, added = None, 0  # Several ranges at once: just redo everything after start
+        elif command == "replace":
+            removed, added = spanned, spanned + delta
+        else:
+            removed, added = max(0, -delta), max(0, delta)
+
+        if removed is None:
+            self.states[line + 1:] = []
+            self._mark_dirty(line, self._last_line())
+        else:
+            self._shift(line, added - removed)
+            self.states[line + 1:line + 1 + removed] = [None] * added
+            self._mark_dirty(line, line + added)
+        return result
+
+    def _shift(self, line, delta):
+        if self.dirty_start is not None and self.dirty_end > line:
+            self.dirty_end = max(line, self.dirty_end + delta)
+
+    def _mark_dirty(self, first, last):
+        self.dirty_start = first if self.dirty_start is None else min(self.dirty_start, first)
+        self.dirty_end = max(self.dirty_end, last)
+        if self._job is not None:
+            self.text_widget.after_cancel(self._job)
+        self._job = self.text_widget.after(self.delay, self._run)  # Debounce: lex once typing pauses
+
+    def _last_line(self):
+        return int(self._call("index", "end-1c").split(".")[0])
+
+    def _run(self):
+        self._job = None
+        if self.dirty_start is None:
+            return
+        if self._highlight_slice():
+            self._job = self.text_widget.after_idle(self._run)
+        else:
+            self.dirty_start = None
+            self.dirty_end = 0
+            self._window = self.WINDOW
+
+    def _highlight_slice(self):
+        """Re-lex one window from the dirty point. Returns True if more work remains."""
+        states = self.states
+        last_line = self._last_line()
+        incremental = resumable(self.lexer)
+        line = min(self.dirty_start, last_line) if incremental else 1
+        while line > 1 and (line >= len(states) or states[line] is None):
+            line -= 1
+        stack = states[line] if line < len(states) and states[line] else ("root",)
+
+        window_end = min(line + self._window, last_line + 1) if incremental else last_line + 1
+        at_end = window_end > last_line
+        limit = window_end if at_end else window_end - 1  # The window's last line may lack context
+        text = self._call("get", f"{line}.0", f"{window_end}.0")
+        tokens = (
+            lex_with_states(self.lexer, text, stack) if incremental
+            else self.lexer.get_tokens_unprocessed(text)
+        )
+
+        committed = {}
+        pending = {}
+        committed_line = line
+        converged = False
+        row, col = line, 0
+        for pos, token, value in tokens:
+            if token is None:
+                if row > limit:
+                    break
+                if row > self.dirty_end and row < len(states) and states[row] == value:
+                    for tag, ranges in pending.items():
+                        committed.setdefault(tag, []).extend(ranges)
+                    converged = True
+                    break
+                if row >= len(states):
+                    states.extend([None] * (row + 1 - len(states)))
+                states[committed_line + 1:row] = [None] * (row - committed_line - 1)
+                states[row] = value
+                for tag, ranges in pending.items():
+                    committed.setdefault(tag, []).extend(ranges)
+                pending = {}
+                committed_line = row
+                continue
+            if not value:
+                continue
+            newlines = value.count("\n")
+            if newlines:
+                end_row, end_col = row + newlines, len(value) - value.rfind("\n") - 1
+            else:
+                end_row, end_col = row, col + len(value)
+            tag = tag_for(token)
+            if tag:
+                pending.setdefault(tag, []).extend((f"{row}.{col}", f"{end_row}.{end_col}"))
+            row, col = end_row, end_col
+
+        if not incremental or (at_end and not converged):
+            for tag, ranges in pending.items():
+                committed.setdefault(tag, []).extend(ranges)
+            committed_line = last_line + 1
+            del states[last_line + 1:]
+        elif converged:
+            committed_line = row
+
+        if committed_line == line:
+            self._window *= 2  # One token spans the whole window; retry with more context
+            return True
+
+        for tag, _ in TOKEN_TAGS:
+            self._call("tag", "remove", tag, f"{line}.0", f"{committed_line}.0")
+            if committed.get(tag):
+                self._call("tag", "add", tag, *committed[tag])
+        if converged or committed_line > last_line:
+            return False
+        self.dirty_start = committed_line
+        return True
+
+
+class CodeBlockHighlighter:
+    """Colours finished code blocks in the chat view without holding up the stream.
+
+    begin() drops a mark where the block starts; submit() lexes the block on a
+    background thread and hands the tag ranges back through the renderer, so
+    they are applied in order with the streamed text. Both may be called off
+    the Tk thread: renderer calls go through `post`, which must run them on it.
+    """
+
+    def __init__(self, renderer, post):
+        self.renderer = renderer
+        self.post = post
+        self.widget = renderer.widget
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="code-highlight")
+        self._count = 0
+        setup_tags(self.widget)
+
+    def begin(self):
+        self._count += 1
+        mark = f"codeblock{self._count}"
+        self.post(self.renderer.mark, mark)
+        return mark
+
+    def submit(self, mark, code, lang):
+        self.executor.submit(self._lex, mark, code, lang)
+
+    def _lex(self, mark, code, lang):
+        ranges = {}
+        row, col = 0, 0
+        for _, token, value in lexer_by_name(lang).get_tokens_unprocessed(code):
+            if not value:
+                continue
+            newlines = value.count("\n")
+            if newlines:
+                end_row, end_col = row + newlines, len(value) - value.rfind("\n") - 1
+            else:
+                end_row, end_col = row, col + len(value)
+            tag = tag_for(token)
+            if tag:
+                ranges.setdefault(tag, []).append((row, col, end_row, end_col))
+            row, col = end_row, end_col
+        self.post(self.renderer.call, self._apply, mark, ranges)
+
+    def _apply(self, mark, ranges):
+        if mark not in self.widget.mark_names():
+            return  # Chat was cleared meanwhile
+        base_line, base_col = map(int, self.widget.index(mark).split("."))
+        self.widget.mark_unset(mark)
+        for tag, spans in ranges.items():
+            indices = []
+            for row, col, end_row, end_col in spans:
+                indices.append(f"{base_line + row}.{col + base_col if row == 0 else col}")
+                indices.append(f"{base_line + end_row}.{end_col + base_col if end_row == 0 else end_col}")
+            self.widget.tag_add(tag, *indices)
@@ -0,0 +1,65 @@
+import os
+import re
+
+
+class IgnoreRules:
+    """.gitignore patterns of one directory, chained to the rules of its parents."""
+
+    def __init__(self, base, patterns=(), parent=None):
+        self.base = base  # Directory the patterns are relative to
+        self.parent = parent
+        self.rules = [rule for rule in map(self._compile, patterns) if rule]
+
+    @classmethod
+    def for_directory(cls, path, parent=None):
+        """Rules for path: the parent's, plus its own .gitignore if it has one."""
+        try:
+            with open(os.path.join(path, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                patterns = f.read().splitlines()
+        except OSError:
+            return parent
+        return cls(path, patterns, parent)
+
+    def ignored(self, path, is_dir):
+        verdict = self.parent.ignored(path, is_dir) if self.parent else False
+        rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+        for regex, negate, dir_only in self.rules:  # Last matching rule wins, like git
+            if (is_dir or not dir_only) and regex.match(rel):
+                verdict = not negate
+        return verdict
+
+    @staticmethod
+    def _compile(pattern):
+        pattern = pattern.rstrip()
+        if not pattern or pattern.startswith("#"):
+            return None
+        negate = pattern.startswith("!")
+        if negate:
+            pattern = pattern[1:]
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern  # A slash anywhere but the end ties the pattern to the base dir
+        pattern = pattern.lstrip("/")
+        out, i = [], 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+            elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+                out.append("/.*")
+                i += 3
+            elif pattern[i] == "*":
+                out.append("[^/]*")
+                i += 1
+            elif pattern[i] == "?":
+                out.append("[^/]")
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+                j = pattern.index("]", i + 1)
+                out.append("[" + pattern[i + 1:j].replace("!", "^", 1) + "]")
+                i = j + 1
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+        prefix = "^" if anchored else "^(?:.*/)?"
+        return re.compile(prefix + "".join(out) + "$"), negate, dir_only
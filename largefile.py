@@ -0,0 +1,229 @@
+import codecs
+import mmap
+import os
+import threading
+import tkinter as tk
+from array import array
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(sample):
+    """Best guess at the encoding of a file from its first bytes."""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample and sample.count(b"\x00") > len(sample) // 4:
+        # Mostly-ASCII UTF-16 without a BOM: every other byte is zero
+        return "utf-16-le" if sample[1::2].count(b"\x00") > sample[::2].count(b"\x00") else "utf-16-be"
+    for cut in range(4):  # The sample may end in the middle of a multi-byte sequence
+        try:
+            sample[:len(sample) - cut].decode("utf-8")
+            return "utf-8"
+        except UnicodeDecodeError:
+            continue
+    return "cp1252" if not any(byte in sample for byte in b"\x81\x8d\x8f\x90\x9d") else "latin-1"
+
+
+def codec_for(encoding, head):
+    """BOM-less codec for decoding slices from the middle of a file, and the BOM length."""
+    if encoding == "utf-8-sig":
+        return "utf-8", 3
+    if encoding == "utf-16":
+        return ("utf-16-le" if head.startswith(codecs.BOM_UTF16_LE) else "utf-16-be"), 2
+    if encoding == "utf-32":
+        return ("utf-32-le" if head.startswith(codecs.BOM_UTF32_LE) else "utf-32-be"), 4
+    return encoding, 0
+
+
+class LineIndex:
+    """Memory-mapped file with its line start offsets indexed on a background thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.stat = os.fstat(self.file.fileno())
+        self.size = self.stat.st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.encoding = detect_encoding(self.map[:65536])
+        self.codec, bom = codec_for(self.encoding, self.map[:4])
+        self.newline = "\n".encode(self.codec)
+        self.offsets = array("Q", [bom])  # offsets[n] is where line n (0-based) starts
+        self.done = False
+        self._closed = False
+        threading.Thread(target=self._index, name="line-index", daemon=True).start()
+
+    def _index(self):
+        step = len(self.newline)
+        find = self.map.find
+        pos = self.offsets[-1]  # Start of the last (possibly unfinished) line: resumes after grow()
+        batch = array("Q")
+        while not self._closed:
+            try:
+                hit = find(self.newline, pos)
+            except ValueError:
+                return  # Map was closed because another file was opened
+            if hit == -1:
+                break
+            if (hit - self.offsets[0]) % step:  # Misaligned match inside a UTF-16/32 code unit
+                pos = hit + 1
+                continue
+            pos = hit + step
+            batch.append(pos)
+            if len(batch) >= 65536:
+                self.offsets.extend(batch)  # Publish in batches so readers see progress
+                batch = array("Q")
+        self.offsets.extend(batch)
+        self.done = True
+
+    def grow(self):
+        """Index only what was appended since the last pass; the previous pass must be done.
+
+        Returns False when the file has to be indexed from scratch instead:
+        it shrank, was replaced, or its mtime went backwards.
+        """
+        stat = os.stat(self.path)
+        if (not self.size or stat.st_ino != self.stat.st_ino or stat.st_size < self.size
+                or stat.st_mtime_ns < self.stat.st_mtime_ns):
+            return False
+        self.stat = stat
+        if stat.st_size == self.size:
+            return True
+        old = self.map
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.map)
+        old.close()
+        self.done = False
+        threading.Thread(target=self._index, name="line-index", daemon=True).start()
+        return True
+
+    @property
+    def line_count(self):
+        count = len(self.offsets)
+        if self.done and self.offsets[-1] >= self.size and count > 1:
+            count -= 1  # File ends with a newline: no extra empty line
+        return count
+
+    def lines(self, first, count):
+        """Decoded text of lines [first, first + count)."""
+        offsets = self.offsets
+        known = len(offsets)
+        if first >= known:
+            return ""
+        start = offsets[first]
+        end = offsets[first + count] if first + count < known else (self.size if self.done else offsets[-1])
+        return self.map[start:end].decode(self.codec, errors="replace")
+
+    def close(self):
+        self._closed = True
+        if self.size:
+            self.map.close()
+        self.file.close()
+
+
+class LargeFileViewer:
+    """Read-only view of a huge file that keeps only the lines on screen in the Text widget."""
+
+    MARGIN = 20  # Extra lines loaded below the visible ones
+
+    def __init__(self, text_widget, on_progress=None):
+        self.text_widget = text_widget
+        self.on_progress = on_progress  # Called with (lines indexed, finished) while indexing
+        self.index = None
+        self.first = 0
+        self._rendered_known = 0  # Indexed line count when the window was last drawn
+        self._reload_pending = False  # The file changed while it was still being indexed
+        for sequence, delta in (("<MouseWheel>", None), ("<Button-4>", -3), ("<Button-5>", 3),
+                                ("<Up>", -1), ("<Down>", 1), ("<Prior>", "page-"), ("<Next>", "page+"),
+                                ("<Control-Home>", "home"), ("<Control-End>", "end")):
+            self.text_widget.bind(sequence, lambda e, d=delta: self.on_scroll(e, d), add="+")
+
+    @property
+    def active(self):
+        return self.index is not None
+
+    def open(self, path):
+        self.close()
+        self.index = LineIndex(path)
+        self.first = 0
+        self.render()
+        self._poll_index()
+
+    def reload(self):
+        """Catch up with changes on disk, keeping the scroll position.
+
+        A file that only grew (a log being written) is indexed from the old
+        end; anything else is indexed again. Changes seen while a pass is
+        still running are picked up once it finishes.
+        """
+        if not self.index.done:
+            self._reload_pending = True
+            return
+        if self.index.grow():
+            self.render()
+            self._poll_index()
+        else:
+            first = self.first
+            self.open(self.index.path)
+            self.scroll_to(first)
+
+    def close(self):
+        self._reload_pending = False
+        if self.index:
+            self.index.close()
+            self.index = None
+            self.text_widget.config(state=tk.NORMAL)
+
+    def visible_lines(self):
+        height = self.text_widget.winfo_height()
+        line_height = max(1, self.text_widget.tk.call("font", "metrics", self.text_widget.cget("font"), "-linespace"))
+        return max(1, height // line_height)
+
+    def render(self):
+        count = self.visible_lines() + self.MARGIN
+        self.first = max(0, min(self.first, self.index.line_count - self.visible_lines()))
+        self._rendered_known = len(self.index.offsets)
+        self.text_widget.config(state=tk.NORMAL)
+        self.text_widget.delete("1.0", tk.END)
+        self.text_widget.insert("1.0", self.index.lines(self.first, count))
+        self.text_widget.config(state=tk.DISABLED)
+
+    def _poll_index(self):
+        if not self.index:
+            return
+        if self.on_progress:
+            self.on_progress(self.index.line_count, self.index.done)
+        window_end = self.first + self.visible_lines() + self.MARGIN
+        if window_end >= self._rendered_known and len(self.index.offsets) > self._rendered_known:
+            self.render()  # Window was cut short by the indexer; fill it in
+        if not self.index.done:
+            self.text_widget.after(250, self._poll_index)
+        elif self._reload_pending:
+            self._reload_pending = False
+            self.reload()
+
+    def scroll_to(self, line):
+        self.first = line
+        self.render()
+
+    def on_scroll(self, event, delta):
+        if not self.index:
+            return None
+        page = self.visible_lines()
+        if delta is None:
+            delta = -3 if event.delta > 0 else 3
+        elif delta in ("page-", "page+"):
+            delta = -page if delta == "page-" else page
+        elif delta == "home":
+            delta = -self.first
+        elif delta == "end":
+            delta = self.index.line_count
+        self.first += delta
+        self.render()
+        return "break"
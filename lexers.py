@@ -0,0 +1,34 @@
+import os
+from functools import lru_cache
+
+from pygments.lexers import get_lexer_by_name, get_lexer_for_filename
+from pygments.lexers.special import TextLexer
+from pygments.util import ClassNotFound
+
+# Building a Pygments lexer means scanning the lexer registry and compiling its
+# regexes, so instances are cached and shared. RegexLexers keep no per-call
+# state, which makes sharing them across threads safe.
+
+
+@lru_cache(maxsize=32)
+def lexer_by_name(name):
+    """Lexer for a fence info string or alias such as "python" or "js"; plain text if unknown."""
+    try:
+        return get_lexer_by_name(name.lower()) if name else TextLexer()
+    except ClassNotFound:
+        return TextLexer()
+
+
+def lexer_for_filename(path):
+    """Lexer picked from a file's name (extension, or the whole name for files like Makefile)."""
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    return _lexer_for_file_key("file" + ext if ext else name)
+
+
+@lru_cache(maxsize=32)
+def _lexer_for_file_key(filename):
+    try:
+        return get_lexer_for_filename(filename)
+    except ClassNotFound:
+        return TextLexer()
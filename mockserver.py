@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4  # The mock's notion of a token
+
+
+def prose_reply(size):
+    """About size bytes of plain sentences."""
+    sentence = "Pika pika, the quick brown fox streams tokens over a lazy socket. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+
+def code_reply(size):
+    """About size bytes that are mostly fenced Python, the worst case for parsing and highlighting."""
+    block = (
+        "Here is the next part:\n```python\n"
+        + "".join(f"def handler_{n}(event, retries={n}):\n    return {{'id': {n}, 'ok': event is not None}}  # done\n"
+                  for n in range(12))
+        + "```\n"
+    )
+    return (block * (size // len(block) + 1))[:size] + "\n```\n"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a real provider
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"object": "list", "data": [{"id": "mock", "object": "model"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        server = self.server
+        server.requests += 1
+        prompt_tokens = sum(len(message.get("content", "")) for message in request.get("messages", ())) // CHARS_PER_TOKEN
+        reply = server.reply
+        time.sleep(server.latency)
+        if not request.get("stream"):
+            self.send_json(completion(request, reply, prompt_tokens))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = server.chunk_tokens * CHARS_PER_TOKEN
+        interval = server.chunk_tokens / server.tokens_per_second if server.tokens_per_second else 0
+        start = time.perf_counter()
+        try:
+            for index, offset in enumerate(range(0, len(reply), step)):
+                delay = start + index * interval - time.perf_counter()  # Paced against the start, so sleeps don't drift
+                if delay > 0:
+                    time.sleep(delay)
+                self.send_event(chunk(request, {"content": reply[offset:offset + step]}))
+            self.send_event(chunk(request, {}, "stop"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self.send_event(usage_chunk(request, prompt_tokens, len(reply) // CHARS_PER_TOKEN))
+            self.send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled the stream
+
+    def send_event(self, data):
+        payload = f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n".encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def chunk(request, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def usage_chunk(request, prompt_tokens, completion_tokens):
+    data = chunk(request, {})
+    data["choices"] = []
+    data["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+    return data
+
+
+def completion(request, reply, prompt_tokens):
+    completion_tokens = len(reply) // CHARS_PER_TOKEN
+    return {
+        "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class MockServer(ThreadingHTTPServer):
+    """Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+
+    Every request gets the same reply, streamed as SSE after `latency`
+    seconds at `tokens_per_second`, `chunk_tokens` tokens per chunk. The
+    settings can be changed between requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, reply="", tokens_per_second=200.0, chunk_tokens=1, latency=0.05, port=0):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.reply = reply
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.latency = latency
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI-compatible streaming endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=200.0, help="tokens per second")
+    parser.add_argument("--chunk", type=int, default=1, help="tokens per chunk")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first chunk")
+    parser.add_argument("--size", type=int, default=4096, help="reply size in bytes")
+    parser.add_argument("--code", action="store_true", help="code-heavy reply")
+    args = parser.parse_args()
+    server = MockServer((code_reply if args.code else prose_reply)(args.size), args.rate, args.chunk, args.latency, args.port)
+    print(f"Mock endpoint at {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+import httpx
+
+
+class LatencyMonitor:
+    """Probes endpoint latency as a task on the stream engine's loop.
+
+    One keep-alive httpx.AsyncClient is kept per base_url, so probes after the
+    first reuse the pooled connection. The UI only ever reads snapshot(),
+    which never touches the network.
+    """
+
+    def __init__(self, min_interval=2.0, max_interval=30.0, window=50, timeout=5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.timeout = timeout
+        self.base_url = ""
+        self.others = ()  # Failover endpoints, probed alongside so the router knows their health
+        self.interval = min_interval
+        self.sessions = {}  # base_url -> httpx.AsyncClient
+        self.samples = {}  # base_url -> deque of latencies in ms
+        self.last_error = {}  # base_url -> short error string, None once healthy again
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self._loop = None
+
+    def start(self, engine):
+        engine.submit(self._run())
+
+    def watch(self, base_url, others=()):
+        """Switch the probed endpoints (e.g. when a model is picked) and probe right away."""
+        self.base_url = base_url or ""
+        self.others = tuple(url for url in others if url and url != self.base_url)
+        self.interval = self.min_interval
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def snapshot(self, base_url=None):
+        """Latest stats for base_url: p50/p95 in ms (or None), sample count and last error."""
+        base_url = self.base_url if base_url is None else base_url
+        with self._lock:
+            samples = sorted(self.samples.get(base_url, ()))
+            error = self.last_error.get(base_url)
+        if not samples:
+            return {"p50": None, "p95": None, "count": 0, "error": error}
+        return {
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "count": len(samples),
+            "error": error,
+        }
+
+    def _session(self, base_url):
+        session = self.sessions.get(base_url)
+        if session is None:
+            session = self.sessions[base_url] = httpx.AsyncClient(timeout=self.timeout)
+        return session
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        while True:
+            base_url = self.base_url
+            if base_url:
+                await self._probe(base_url)
+            others = self.others
+            if others:
+                await asyncio.gather(*(self._probe(url, adapt=False) for url in others))
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _probe(self, base_url, adapt=True):
+        start_time = time.perf_counter()
+        try:
+            # Any HTTP reply counts as a round trip; only server errors mark the endpoint unhealthy
+            async with self._session(base_url).stream("GET", base_url) as response:
+                if response.status_code >= 500:
+                    raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            latency = (time.perf_counter() - start_time) * 1000
+        except Exception as e:
+            self._record_error(base_url, e, adapt)
+            return
+
+        with self._lock:
+            samples = self.samples.setdefault(base_url, deque(maxlen=self.window))
+            previous = sorted(samples)[len(samples) // 2] if samples else None
+            samples.append(latency)
+            self.last_error[base_url] = None
+        if not adapt:
+            return
+        # Back off while latency is steady, probe eagerly again when it jumps
+        if previous is not None and latency < previous * 2:
+            self.interval = min(self.interval * 1.5, self.max_interval)
+        else:
+            self.interval = self.min_interval
+
+    def _record_error(self, base_url, error, adapt=True):
+        message = str(error) if isinstance(error, httpx.HTTPStatusError) else type(error).__name__
+        with self._lock:
+            self.last_error[base_url] = message
+        if adapt:
+            self.interval = self.min_interval
@@ -0,0 +1,73 @@
+import tkinter as tk
+
+import debug
+
+
+class StreamRenderer:
+    """Batches text headed for a read-only Text widget into frame-rate-limited inserts.
+
+    write() only appends to a buffer; flush() is called once per frame by the
+    UI pump and applies everything buffered since the last frame with a single
+    insert call, merging consecutive writes that share a tag. Everything here
+    runs on the Tk thread: other threads reach it through the stream engine's
+    event queue.
+    """
+
+    def __init__(self, widget, fps=30):
+        self.widget = widget
+        self.frame_interval = 1.0 / max(1, fps)
+        self._pending = []  # [parts, tag] text runs and (fn, args) calls, in arrival order
+
+    def write(self, text, tag=None):
+        if not text:
+            return
+        last = self._pending[-1] if self._pending else None
+        if isinstance(last, list) and last[1] == tag:
+            last[0].append(text)
+        else:
+            self._pending.append([[text], tag])
+
+    def call(self, fn, *args):
+        """Run fn once everything written before it has been drawn."""
+        self._pending.append((fn, args))
+
+    def mark(self, name):
+        """Place a mark where the next write will land."""
+        self.call(self._set_mark, name)
+
+    def discard(self):
+        """Drop anything not yet drawn (used when the view is cleared)."""
+        self._pending = []
+
+    def _set_mark(self, name):
+        self.widget.mark_set(name, "end-1c")
+        self.widget.mark_gravity(name, tk.LEFT)
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with debug.tracer.span("render"):
+            self._draw(pending)
+
+    def _draw(self, pending):
+        follow = self.widget.yview()[1] >= 0.999  # Only autoscroll if the user is already at the bottom
+        args = []
+        for item in pending:
+            if isinstance(item, list):
+                args.extend(("".join(item[0]), item[1] or ()))
+                continue
+            self._insert(args)
+            args = []
+            fn, fn_args = item
+            fn(*fn_args)
+        self._insert(args)
+        if follow:
+            self.widget.yview(tk.END)
+
+    def _insert(self, args):
+        if not args:
+            return
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, *args)
+        self.widget.config(state=tk.DISABLED)
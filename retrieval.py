@@ -0,0 +1,293 @@
+import asyncio
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import Future, InvalidStateError
+from fnmatch import fnmatch
+
+from ignore import IgnoreRules
+
+Chunk = namedtuple("Chunk", "path start end text score")  # start/end: 1-based line numbers
+
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 512 * 1024  # Bigger files are most likely data or generated, not worth indexing
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def terms(text):
+    """Lower-cased search terms: whole identifiers plus their camelCase/snake_case parts."""
+    out = []
+    for word in IDENTIFIER.findall(text):
+        if len(word) < 2:
+            continue
+        out.append(word.lower())
+        parts = SUBWORD.findall(word)
+        if len(parts) > 1:
+            out.extend(part.lower() for part in parts if len(part) > 1)
+    return out
+
+
+def read_text(path):
+    """File contents as text, or None for binary, unreadable or oversized files."""
+    try:
+        if os.path.getsize(path) > MAX_FILE_BYTES:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\x00" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class BM25Index:
+    """In-memory BM25 index over fixed-size line chunks of files, updated one file at a time."""
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self):
+        self.chunks = {}  # chunk id -> (path, start, end, text, length)
+        self.postings = {}  # term -> {chunk id: term frequency}
+        self.files = {}  # path -> (mtime_ns, [chunk ids])
+        self.total_length = 0
+        self._ids = itertools.count()
+
+    def refresh(self, path):
+        """Index path if it is new or changed since it was indexed, drop it if it is gone."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            prefix = path + os.sep
+            for gone in [path] + [known for known in self.files if known.startswith(prefix)]:
+                self.remove(gone)  # A deleted directory takes its files with it
+            return
+        known = self.files.get(path)
+        if known and known[0] == mtime:
+            return
+        self.remove(path)
+        text = read_text(path)
+        ids = []
+        if text:
+            lines = text.splitlines(keepends=True)
+            for start in range(0, len(lines), CHUNK_LINES):
+                chunk = lines[start:start + CHUNK_LINES]
+                ids.append(self._add_chunk(path, start + 1, start + len(chunk), "".join(chunk)))
+        self.files[path] = (mtime, ids)
+
+    def _add_chunk(self, path, start, end, text):
+        chunk_id = next(self._ids)
+        words = terms(text) + terms(os.path.basename(path))  # File names are strong hints
+        self.chunks[chunk_id] = (path, start, end, text, len(words))
+        self.total_length += len(words)
+        for term, count in Counter(words).items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+        return chunk_id
+
+    def remove(self, path):
+        known = self.files.pop(path, None)
+        if not known:
+            return
+        for chunk_id in known[1]:
+            text, length = self.chunks[chunk_id][3:]
+            self.total_length -= length
+            for term in set(terms(text) + terms(os.path.basename(path))):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+            del self.chunks[chunk_id]
+
+    def search(self, query, k=5):
+        count = len(self.chunks)
+        if not count:
+            return []
+        average = self.total_length / count
+        scores = Counter()
+        for term in set(terms(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                length = self.chunks[chunk_id][4]
+                scores[chunk_id] += idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / average))
+        return [Chunk(*self.chunks[chunk_id][:4], score) for chunk_id, score in scores.most_common(k)]
+
+
+def walk(root, exclude_globs, use_gitignore):
+    """Every indexable file path under root, honouring the file pane's exclusions."""
+    stack = [(root, IgnoreRules.for_directory(root) if use_gitignore else None)]
+    while stack:
+        directory, rules = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if any(fnmatch(entry.name, pattern) for pattern in exclude_globs):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if rules and rules.ignored(entry.path, is_dir):
+                continue
+            if is_dir:
+                stack.append((entry.path, IgnoreRules.for_directory(entry.path, rules) if use_gitignore else rules))
+            elif entry.is_file():
+                yield entry.path
+
+
+def index_worker(commands, results, rescan_interval):
+    """Main loop of the indexing process.
+
+    Commands: ("root", path, exclude_globs, use_gitignore), ("paths", [changed paths]),
+    ("query", id, text, k) and ("stop",). Files are indexed a batch at a time
+    between commands, so queries are answered even while a big folder is
+    still being scanned. After the first scan the index follows the paths the
+    folder watcher reports; with a rescan_interval the whole tree is also
+    re-walked that often (stat only, files whose mtime moved are read again).
+    """
+    index = BM25Index()
+    root = None
+    settings = ()
+    pending = deque()  # Paths to (re)check
+    scan = None  # Generator of the walk in progress
+    seen = set()
+    last_scan = 0.0
+    while True:
+        busy = scan is not None or pending
+        try:
+            command = commands.get(timeout=0 if busy else 1.0)
+        except queue.Empty:
+            command = None
+        if command is not None:
+            kind = command[0]
+            if kind == "stop":
+                return
+            if kind == "root":
+                root, settings = command[1], command[2:]
+                index = BM25Index()
+                pending.clear()
+                scan, seen, last_scan = walk(root, *settings), set(), time.monotonic()
+            elif kind == "paths" and root:
+                pending.extend(path for path in command[1] if path.startswith(root))
+            elif kind == "query":
+                _, query_id, text, k = command
+                results.put(("result", query_id, index.search(text, k)))
+            continue
+
+        for _ in range(50):
+            if pending:
+                path = pending.popleft()
+                if os.path.isdir(path):
+                    pending.extend(walk(path, *settings))
+                else:
+                    index.refresh(path)
+            elif scan is not None:
+                path = next(scan, None)
+                if path is None:
+                    for gone in [path for path in index.files if path not in seen]:
+                        index.remove(gone)
+                    scan = None
+                    results.put(("progress", len(index.files), True))
+                    break
+                seen.add(path)
+                index.refresh(path)
+            else:
+                break
+        else:
+            results.put(("progress", len(index.files), False))
+        if rescan_interval and scan is None and root and time.monotonic() - last_scan > rescan_interval:
+            scan, seen, last_scan = walk(root, *settings), set(), time.monotonic()
+
+
+class Retriever:
+    """Front end of the workspace index, which lives in a separate process.
+
+    Indexing and scoring never run in the GUI process, so a large folder can't
+    stall the UI or the stream engine. Queries are answered asynchronously and
+    give up after a timeout, in which case the request goes out without
+    project context.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.files_indexed = 0
+        self.ready = False  # First full scan finished
+        self._context = multiprocessing.get_context("spawn")  # Never fork a process running Tk
+        self._commands = None
+        self._results = None
+        self._process = None
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self._process is not None
+
+    def set_root(self, path):
+        if self._process is None:
+            self._commands = self._context.Queue()
+            self._results = self._context.Queue()
+            self._process = self._context.Process(
+                target=index_worker, args=(self._commands, self._results, self.config.retrieval_rescan_interval),
+                name="workspace-index", daemon=True
+            )
+            self._process.start()
+            threading.Thread(target=self._read_results, name="workspace-index-results", daemon=True).start()
+        self.files_indexed, self.ready = 0, False
+        self._commands.put(("root", path, list(self.config.file_exclude_globs), self.config.respect_gitignore))
+
+    def refresh(self, paths):
+        """Re-check paths reported changed by the folder watcher."""
+        if self._process is not None and paths:
+            self._commands.put(("paths", list(paths)))
+
+    async def query(self, text, k, timeout=0.5):
+        if self._process is None:
+            return []
+        future = Future()
+        with self._lock:
+            query_id = next(self._ids)
+            self._futures[query_id] = future
+        self._commands.put(("query", query_id, text, k))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            return []
+        finally:
+            with self._lock:
+                self._futures.pop(query_id, None)
+
+    def stop(self):
+        if self._process is not None:
+            self._commands.put(("stop",))
+
+    def _read_results(self):
+        while True:
+            message = self._results.get()
+            try:
+                if message[0] == "result":
+                    with self._lock:
+                        future = self._futures.get(message[1])
+                    if future is not None:
+                        try:
+                            future.set_result(message[2])
+                        except InvalidStateError:
+                            pass  # The query timed out and cancelled it meanwhile
+                elif message[0] == "progress":
+                    self.files_indexed, self.ready = message[1], message[2]
+            except Exception as e:  # One bad message must not stop every later query being answered
+                print(f"Workspace index result error: {e}")
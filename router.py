@@ -0,0 +1,183 @@
+import asyncio
+import random
+import time
+
+from openai import APIConnectionError
+
+RETRYABLE_STATUS = {408, 409, 429}  # Plus every 5xx
+DEFAULT_LATENCY_MS = 1000.0  # Assumed for an endpoint nothing is known about yet
+STICKINESS = 0.75  # The selected model wins unless another endpoint is clearly healthier
+
+
+def retryable(error):
+    """Connect errors, timeouts, rate limits and server errors are worth another try."""
+    if isinstance(error, APIConnectionError):  # Includes APITimeoutError
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After), or None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None  # An HTTP date; fall back to our own backoff
+
+
+def describe(error):
+    status = getattr(error, "status_code", None)
+    return f"HTTP {status}" if status else type(error).__name__
+
+
+class Endpoint:
+    """What the router has seen of one base_url."""
+
+    __slots__ = ("latency", "error_rate", "failures", "down_until")
+
+    def __init__(self):
+        self.latency = None  # EWMA of ms until the first chunk (or the reply, unstreamed)
+        self.error_rate = 0.0  # EWMA of failed attempts
+        self.failures = 0  # In a row
+        self.down_until = 0.0
+
+
+class PrefetchedStream:
+    """A chat completion stream whose first chunk has already arrived."""
+
+    def __init__(self, response, chunks, first):
+        self.response = response
+        self.chunks = chunks
+        self.first = first
+
+    async def __aiter__(self):
+        if self.first is not None:
+            yield self.first
+        async for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        await self.response.close()
+
+
+async def prefetch(response):
+    chunks = response.__aiter__()
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await response.close()
+        raise
+    return PrefetchedStream(response, chunks, first)
+
+
+class Router:
+    """Sends each request to the healthiest endpoint among the models it is interchangeable with.
+
+    Models listed together in config.routing_groups are treated as the same
+    model served by different providers. Endpoints are ranked by the time to
+    first chunk measured on real requests (the latency monitor's probes until
+    there is one), penalised by their recent error rate; one that keeps failing
+    is benched for a while. A streamed request counts as started only once its
+    first chunk arrives, so a provider that accepts the call and then errors
+    is still failed over. Retries of the same endpoint back off exponentially
+    with full jitter, or wait as long as its Retry-After asked, never more
+    than retry_max_delay. Runs on the stream engine's loop only.
+    """
+
+    def __init__(self, monitor, config):
+        self.monitor = monitor
+        self.config = config
+        self.endpoints = {}  # base_url -> Endpoint
+
+    def group(self, model_config):
+        """Usable available_models entries interchangeable with model_config, itself first."""
+        names = next((group for group in self.config.routing_groups if model_config.get("name") in group), ())
+        others = [
+            model for model in self.config.available_models
+            if model["name"] in names and model["name"] != model_config.get("name")
+        ]
+        return [model for model in [model_config] + others if model.get("base_url") and model.get("api_key")]
+
+    def score(self, model, selected):
+        endpoint = self.endpoints.get(model["base_url"]) or Endpoint()
+        latency = endpoint.latency
+        if latency is None:
+            latency = self.monitor.snapshot(model["base_url"])["p50"] or DEFAULT_LATENCY_MS
+        score = latency * (1 + 4 * endpoint.error_rate) * (STICKINESS if model is selected else 1)
+        return (endpoint.down_until > time.monotonic(), score)
+
+    def rank(self, model_config):
+        return sorted(self.group(model_config), key=lambda model: self.score(model, model_config))
+
+    def record(self, base_url, latency=None, wait=None):
+        """Fold one attempt into the endpoint's health; latency is None for a failure.
+
+        wait is the failure's Retry-After: the endpoint stays benched at least
+        that long, so other endpoints are tried first meanwhile.
+        """
+        endpoint = self.endpoints.setdefault(base_url, Endpoint())
+        failed = latency is None
+        endpoint.error_rate = 0.7 * endpoint.error_rate + (0.3 if failed else 0.0)
+        if failed:
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + max(min(60, 2 ** endpoint.failures), wait or 0)
+        else:
+            endpoint.failures = 0
+            endpoint.down_until = 0.0
+            endpoint.latency = latency if endpoint.latency is None else 0.7 * endpoint.latency + 0.3 * latency
+
+    async def open(self, clients, request, notify, **params):
+        """Start a chat completion for request, retrying and failing over until it is under way.
+
+        The request's model settings are switched to the entry that answered,
+        so pricing follows the provider. notify(text) is called with each
+        routing decision, for the status bar.
+        """
+        attempts = max(1, self.config.retry_max_attempts)
+        tried = {}  # base_url -> attempts so far
+        errors = {}  # base_url -> its last error
+        error = None
+        for attempt in range(attempts):
+            ranked = self.rank(request.model_config)
+            if not ranked:
+                raise ValueError("Invalid API key or base URL for selected model")
+            model = ranked[0]
+            base_url = model["base_url"]
+            if base_url in tried:
+                max_delay = self.config.retry_max_delay
+                delay = min(max_delay, retry_after(errors[base_url]) or random.uniform(
+                    0, min(max_delay, self.config.retry_base_delay * 2 ** tried[base_url])
+                ))
+                notify(f"{describe(errors[base_url])}, retrying {model['name']} ({attempt + 1}/{attempts}) in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            elif error is not None:
+                notify(f"{describe(error)}, failing over to {model['name']}")
+            tried[base_url] = tried.get(base_url, 0) + 1
+            client = clients.get(base_url, model["api_key"]).with_options(max_retries=0)  # Retries are ours
+            start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(model=model["name"], **params)
+                accepted = time.perf_counter()  # Headers are in; the first chunk is still to come
+                if params.get("stream"):
+                    response = await prefetch(response)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                self.record(base_url, wait=retry_after(e))
+                error = errors[base_url] = e
+                continue
+            self.record(base_url, (time.perf_counter() - start) * 1000)
+            if request.trace is not None:
+                request.trace.connected(model["name"], base_url, attempt + 1, accepted)
+            if model is not request.model_config:
+                request.model, request.base_url, request.api_key = model["name"], base_url, model["api_key"]
+                request.model_config = model
+                notify(f"Routed to {model['name']}")
+            return response
+        raise error
@@ -0,0 +1,87 @@
+import asyncio
+
+
+class _Barrier:
+    """Queue entry that runs fn() on the loop between jobs (see RequestScheduler.reset)."""
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+
+class RequestScheduler:
+    """Runs chat requests in submission order on the stream engine's loop.
+
+    Messages submitted while a reply is streaming wait in a FIFO queue instead
+    of being dropped. Each job runs as its own task, so cancel() is simply
+    task.cancel(): the CancelledError surfaces at the job's current await and
+    the job is expected to close its stream on the way out.
+    """
+
+    def __init__(self, engine, handler):
+        self.engine = engine
+        self.handler = handler  # Coroutine function, awaited as handler(job) on the loop
+        self.jobs = asyncio.Queue()  # Only touched on the loop thread
+        self.busy = False
+        self.current = None  # Task of the job in flight
+        engine.submit(self._run())
+
+    @property
+    def pending(self):
+        return self.jobs.qsize()
+
+    def submit(self, job):
+        self.engine.call_soon(self.jobs.put_nowait, job)
+
+    def cancel(self):
+        """Stop the job in flight; queued jobs still run."""
+        self.engine.call_soon(self._cancel_current)
+
+    def cancel_all(self):
+        """Stop the job in flight and forget everything queued behind it."""
+        self.engine.call_soon(self._cancel_all)
+
+    def reset(self, fn):
+        """Drop queued jobs and cancel the one in flight; once it has unwound, run fn() on the loop.
+
+        fn runs before any job submitted after this call, so state it resets
+        (the conversation, the session) can't be touched by the old reply.
+        """
+        self.engine.call_soon(self._reset, fn)
+
+    def _reset(self, fn):
+        self._cancel_all()
+        self.jobs.put_nowait(_Barrier(fn))
+
+    def _cancel_current(self):
+        if self.current is not None and not self.current.done():
+            self.current.cancel()
+
+    def _cancel_all(self):
+        while not self.jobs.empty():
+            self.jobs.get_nowait()
+        self._cancel_current()
+
+    async def _run(self):
+        while True:
+            job = await self.jobs.get()
+            if isinstance(job, _Barrier):
+                try:
+                    job.fn()
+                except Exception as e:
+                    print(f"Request worker error: {e}")
+                continue
+            self.busy = True
+            self.current = asyncio.ensure_future(self.handler(job))
+            try:
+                await self.current
+            except asyncio.CancelledError:
+                if not self.current.done():
+                    self.current.cancel()  # The worker itself is being cancelled (engine shutdown)
+                    raise
+                # The job was cancelled; carry on with the next one
+            except Exception as e:
+                print(f"Request worker error: {e}")
+            finally:
+                self.current = None
+                self.busy = False
@@ -0,0 +1,180 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from fences import FenceParser
+
+StoredMessage = namedtuple("StoredMessage", "seq role content pinned")
+Hit = namedtuple("Hit", "session_id seq role content created")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    UNIQUE (session_id, seq)
+);
+-- Contentless full-text index over messages (rowid = messages.id), prose and fenced code apart
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(prose, code, content='');
+"""
+
+
+def split_code(content):
+    """(prose, code) text of a message, split on its fenced code blocks."""
+    parser = FenceParser()
+    prose, code = [], []
+    for segment in parser.feed(content) + parser.close():
+        if segment.kind == "code":
+            code.append(segment.text)
+        elif segment.kind == "text":
+            prose.append(segment.text)
+    return "".join(prose), "".join(code)
+
+
+def fts_query(text):
+    """FTS5 query matching every word of text; the last one may be a prefix."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SessionStore:
+    """Chat sessions in an append-only SQLite database (WAL mode).
+
+    Messages are written as they are committed by a dedicated writer thread
+    fed through a queue, so callers on the Tk thread or the engine loop never
+    wait on the disk. Reads use their own connection; with WAL they are not
+    blocked by the writer. Loading a session starts from its tail, which the
+    (session_id, seq) index makes a short range scan whatever the history size.
+    Each message is added to an FTS5 index in the same transaction that stores
+    it, so search never needs a rebuild.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._reader = self._connect()
+        indexed = self._reader.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        self._reader.executescript(SCHEMA)
+        self._writes = queue.Queue()
+        if not indexed:
+            self._writes.put(self._backfill_index)  # Store written before search existed
+        self._thread = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # Durable across app crashes; fsyncs only at checkpoints
+        return db
+
+    # ------------------ Writes (queued) ---------------------
+
+    def new_session(self):
+        session_id = uuid.uuid4().hex
+        self._writes.put(("INSERT INTO sessions VALUES (?, ?)", (session_id, time.time())))
+        return session_id
+
+    def append(self, session_id, message):
+        row = (session_id, message.seq, message.role, message.content, int(message.pinned), time.time())
+        self._writes.put(lambda db: self._insert(db, row))
+
+    def _insert(self, db, row):
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO messages (session_id, seq, role, content, pinned, created) VALUES (?, ?, ?, ?, ?, ?)",
+            row
+        )
+        if cursor.rowcount:
+            db.execute("INSERT INTO messages_fts (rowid, prose, code) VALUES (?, ?, ?)",
+                       (cursor.lastrowid, *split_code(row[3])))
+
+    def _backfill_index(self, db):
+        for rowid, content in db.execute("SELECT id, content FROM messages").fetchall():
+            db.execute("INSERT INTO messages_fts (rowid, prose, code) VALUES (?, ?, ?)", (rowid, *split_code(content)))
+
+    def set_pinned(self, session_id, seqs, pinned=True):
+        self._writes.put((
+            f"UPDATE messages SET pinned = ? WHERE session_id = ? AND seq IN ({','.join('?' * len(seqs))})",
+            (int(pinned), session_id, *seqs)
+        ))
+
+    def unpin_all(self, session_id):
+        self._writes.put(("UPDATE messages SET pinned = 0 WHERE session_id = ? AND pinned", (session_id,)))
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._writes.join()
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            while True:  # Commit whatever piled up in one transaction
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    for item in batch:
+                        if callable(item):
+                            item(db)
+                        else:
+                            db.execute(*item)
+            except Exception as e:  # Not only sqlite3.Error: the thread must outlive a bad item, or flush() hangs
+                print(f"Session store write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    # ------------------ Reads ---------------------
+
+    def last_session(self):
+        """Most recently written session with at least one message, or None."""
+        row = self._reader.execute("SELECT session_id FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id, before=None, limit=200):
+        """Up to limit messages of a session with seq < before (the newest ones), oldest first."""
+        if before is None:
+            before = 1 << 62
+        rows = self._reader.execute(
+            "SELECT seq, role, content, pinned FROM messages WHERE session_id = ? AND seq < ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (session_id, before, limit)
+        ).fetchall()
+        rows.reverse()
+        return [StoredMessage(seq, role, content, bool(pinned)) for seq, role, content, pinned in rows]
+
+    def search(self, text, code_only=False, limit=50):
+        """Messages containing every word of text, newest first. code_only looks inside code blocks only."""
+        query = fts_query(text)
+        if not query:
+            return []
+        if code_only:
+            query = f"code : ({query})"
+        try:
+            rows = self._reader.execute(
+                "SELECT m.session_id, m.seq, m.role, m.content, m.created FROM messages_fts "
+                "JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ? "
+                "ORDER BY messages_fts.rowid DESC LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []  # Query FTS5 can't parse
+        return [Hit(*row) for row in rows]
@@ -0,0 +1,102 @@
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+COLUMNS = "{:<8} {:<20} {:>8} {:>7} {:>7} {:>8} {:>9} {:>9} {:>7} {:>6}  {}"
+HEADER = COLUMNS.format("Time", "Model", "Connect", "TTFT", "Total", "Tok/s", "Gap p95", "Render", "Out", "Tries", "Outcome")
+
+
+def seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def gap_label(trace):
+    gap = trace.gap_percentile(0.95)
+    if gap == 0:
+        return "-"  # Fewer than two chunks
+    return f"<={gap}ms" if gap is not None else ">2s"
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+class StatsWindow:
+    """Recent request telemetry, newest first, refreshed while the window is open.
+
+    Connect and TTFT point at the provider or the network, the inter-chunk gaps
+    at the stream itself, and the render lag at the Tk side.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, root, config, telemetry):
+        self.telemetry = telemetry
+        self.shown = None
+        self.window = tk.Toplevel(root)
+        self.window.title("Request stats")
+        self.window.geometry("980x420")
+        self.window.configure(bg=config.bg_color)
+        self.summary = tk.Label(self.window, bg=config.bg_color, fg=config.loading_color,
+                                font=config.text_font, anchor=tk.W)
+        self.summary.pack(fill=tk.X, padx=10, pady=(10, 0))
+        buttons = tk.Frame(self.window, bg=config.bg_color)
+        buttons.pack(side=tk.BOTTOM, fill=tk.X)
+        tk.Button(
+            buttons, text="Export JSONL...", command=self.export,
+            bg=config.bg_color, fg=config.fg_color, activebackground=config.code_bg,
+            activeforeground=config.code_fg, relief="flat", font=config.text_font
+        ).pack(side=tk.RIGHT, padx=10, pady=5)
+        self.table = tk.Text(
+            self.window, wrap=tk.NONE, state=tk.DISABLED, bg=config.bg_color, fg=config.fg_color,
+            font=("Consolas", 10), relief="flat", padx=10, pady=10
+        )
+        self.table.tag_configure("header", foreground=config.kaomoji_color)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        traces = self.telemetry.recent()
+        key = (len(traces), traces[-1].render_samples if traces else 0)
+        if key != self.shown:  # Only redraw when something changed
+            self.shown = key
+            self.draw(traces)
+        self.window.after(self.REFRESH_MS, self.refresh)
+
+    def draw(self, traces):
+        sent = [trace for trace in traces if not trace.cached and trace.ttft is not None]
+        ttft = median(trace.ttft for trace in sent)
+        rate = median(trace.tokens_per_second for trace in sent)
+        lag = max((trace.render_lag_max for trace in traces), default=0.0)
+        self.summary.config(text=f"{len(traces)} request(s) | median TTFT {seconds(ttft)} | "
+                                 f"median {rate or 0:.1f} tok/s | worst render lag {lag * 1000:.0f}ms")
+        rows = []
+        for trace in reversed(traces):
+            rows.append(COLUMNS.format(
+                time.strftime("%H:%M:%S", time.localtime(trace.started_at)), trace.model[:20],
+                seconds(trace.connect), seconds(trace.ttft), seconds(trace.end),
+                f"{trace.tokens_per_second:.1f}", gap_label(trace),
+                f"{trace.render_lag_max * 1000:.0f}ms", trace.output_tokens, trace.attempts,
+                "cached" if trace.cached else trace.outcome
+            ))
+        self.table.config(state=tk.NORMAL)
+        self.table.delete(1.0, tk.END)
+        self.table.insert(tk.END, HEADER + "\n", "header")
+        self.table.insert(tk.END, "\n".join(rows))
+        self.table.config(state=tk.DISABLED)
+
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.window, defaultextension=".jsonl", filetypes=[("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        try:
+            count = self.telemetry.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {e}", parent=self.window)
+            return
+        self.summary.config(text=f"Exported {count} request(s) to {path}")
@@ -0,0 +1,140 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+GAP_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # Upper edges; one more bucket above the last
+
+
+class RequestTrace:
+    """Timings of one request, filled in as it goes.
+
+    Everything is in seconds from start except the histogram. The stream
+    engine writes it; the render lag is reported back from the Tk thread,
+    once per frame, for the first chunk drawn in that frame (the one that
+    waited longest).
+    """
+
+    __slots__ = (
+        "model", "base_url", "started_at", "start", "connect", "ttft", "end", "chunks", "last_chunk",
+        "gap_histogram", "gap_max", "render_lag_max", "render_lag_total", "render_samples", "awaiting_render",
+        "input_tokens", "output_tokens", "attempts", "cached", "outcome"
+    )
+
+    def __init__(self, model, base_url):
+        self.model = model
+        self.base_url = base_url
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.connect = None  # Until the provider's response headers arrived (network and queueing, before generation)
+        self.ttft = None  # Until the first chunk with text
+        self.end = None
+        self.chunks = 0
+        self.last_chunk = None
+        self.gap_histogram = [0] * (len(GAP_BUCKETS_MS) + 1)  # Time between chunks with text
+        self.gap_max = 0.0
+        self.render_lag_max = 0.0  # From a chunk's arrival to it being drawn in chat_display
+        self.render_lag_total = 0.0
+        self.render_samples = 0
+        self.awaiting_render = False
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.attempts = 0
+        self.cached = False
+        self.outcome = "ok"  # ok, cancelled or error
+
+    def connected(self, model, base_url, attempts=1, at=None):
+        """The provider that will answer (after any failover) accepted the request at perf_counter() time `at`."""
+        self.connect = (at or time.perf_counter()) - self.start
+        self.model, self.base_url, self.attempts = model, base_url, attempts
+
+    def chunk(self):
+        """A chunk with text arrived; returns its arrival time."""
+        now = time.perf_counter()
+        if self.ttft is None:
+            self.ttft = now - self.start
+        else:
+            gap = now - self.last_chunk
+            self.gap_histogram[bisect.bisect_left(GAP_BUCKETS_MS, gap * 1000)] += 1
+            self.gap_max = max(self.gap_max, gap)
+        self.last_chunk = now
+        self.chunks += 1
+        return now
+
+    def rendered(self, arrived):
+        """Called on the Tk thread once the chunk that arrived at arrived has been drawn."""
+        lag = time.perf_counter() - arrived
+        self.render_lag_max = max(self.render_lag_max, lag)
+        self.render_lag_total += lag
+        self.render_samples += 1
+        self.awaiting_render = False
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter() - self.start
+
+    @property
+    def tokens_per_second(self):
+        if self.ttft is None or self.end is None or self.end <= self.ttft:
+            return 0.0
+        return self.output_tokens / (self.end - self.ttft)
+
+    def gap_percentile(self, fraction):
+        """Upper edge in ms of the histogram bucket holding that fraction of gaps (None for the open bucket)."""
+        total = sum(self.gap_histogram)
+        if not total:
+            return 0
+        seen = 0
+        for edge, count in zip(GAP_BUCKETS_MS + (None,), self.gap_histogram):
+            seen += count
+            if seen >= total * fraction:
+                return edge
+        return None
+
+    def to_dict(self):
+        return {
+            "time": self.started_at,
+            "model": self.model,
+            "base_url": self.base_url,
+            "outcome": self.outcome,
+            "cached": self.cached,
+            "attempts": self.attempts,
+            "connect_s": self.connect,
+            "ttft_s": self.ttft,
+            "total_s": self.end,
+            "chunks": self.chunks,
+            "gap_histogram_ms": dict(zip([f"<={edge}" for edge in GAP_BUCKETS_MS] + [f">{GAP_BUCKETS_MS[-1]}"],
+                                         self.gap_histogram)),
+            "gap_max_s": self.gap_max,
+            "render_lag_max_s": self.render_lag_max,
+            "render_lag_avg_s": self.render_lag_total / self.render_samples if self.render_samples else 0.0,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_per_s": self.tokens_per_second,
+        }
+
+
+class Telemetry:
+    """Ring buffer of the last finished request traces."""
+
+    def __init__(self, capacity=500):
+        self.traces = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        with self._lock:
+            self.traces.append(trace)
+
+    def recent(self):
+        """Finished traces, oldest first."""
+        with self._lock:
+            return list(self.traces)
+
+    def export(self, path):
+        """Write every buffered trace to path as JSON lines; returns how many."""
+        traces = self.recent()
+        with open(path, "w", encoding="utf-8") as f:
+            for trace in traces:
+                f.write(json.dumps(trace.to_dict()) + "\n")
+        return len(traces)
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from fences import FenceParser, Segment
+
+PIECES = ["```", "````", "`", "``", "\n", " ", "\t", "py", "python", "x", "text", "a b", "\r", "~"]
+
+
+def parse(chunks):
+    """Segments for a response streamed as chunks, adjacent text/code runs merged."""
+    parser = FenceParser()
+    segments = []
+    for chunk in chunks:
+        segments.extend(parser.feed(chunk))
+    segments.extend(parser.close())
+    merged = []
+    for segment in segments:
+        same_run = merged and (merged[-1].kind, merged[-1].lang) == (segment.kind, segment.lang)
+        if same_run and segment.kind in ("text", "code"):
+            merged[-1] = merged[-1]._replace(text=merged[-1].text + segment.text)
+        elif segment.kind in ("open", "close") or segment.text:
+            merged.append(segment)
+    return merged
+
+
+def random_chunks(rng, text):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 8)))) if len(text) > 1 else []
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+class FenceParserTest(unittest.TestCase):
+    def test_fenced_block(self):
+        self.assertEqual(parse(["Hi\n```python\nx = 1\n```\nBye"]), [
+            Segment("text", "Hi\n", ""),
+            Segment("open", "", "python"),
+            Segment("code", "x = 1\n", "python"),
+            Segment("close", "", "python"),
+            Segment("text", "Bye", ""),
+        ])
+
+    def test_fence_split_across_chunks(self):
+        self.assertEqual(parse(["Hi\n`", "``py", "thon\nx", " = 1\n``", "`\n"]), parse(["Hi\n```python\nx = 1\n```\n"]))
+
+    def test_inline_backticks_are_not_a_fence(self):
+        self.assertEqual(parse(["```py`x\n```"]), parse(["```py", "`x\n```"]))
+        self.assertEqual(parse(["```py`x\n```"])[:1], [Segment("text", "```py`x\n", "")])
+
+    def test_text_after_closing_ticks_stays_code(self):
+        self.assertEqual(parse(["```\na\n``` b\n```\n"]), [
+            Segment("open", "", ""),
+            Segment("code", "a\n``` b\n", ""),
+            Segment("close", "", ""),
+        ])
+
+    def test_longer_fence_needs_as_many_ticks_to_close(self):
+        segments = parse(["````md\n```\ninner\n```\n````\n"])
+        self.assertEqual(segments[1], Segment("code", "```\ninner\n```\n", "md"))
+        self.assertEqual(segments[-1].kind, "close")
+
+    def test_unclosed_fence_at_end(self):
+        self.assertEqual(parse(["```sh\nls"]), [Segment("open", "", "sh"), Segment("code", "ls", "sh")])
+
+    def test_random_chunking_gives_identical_output(self):
+        rng = random.Random(4)
+        for _ in range(20000):
+            text = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 14)))
+            expected = parse([text])
+            chunks = random_chunks(rng, text)
+            self.assertEqual(parse(chunks), expected, f"{text!r} chunked as {chunks!r}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Token counting per model, exact where a tokenizer is available.
+
+Exact counts need the optional `tokenizers` package (pip install tokenizers)
+and a tokenizer for the model: set "tokenizer" in its available_models entry
+to a local tokenizer.json (or a Hugging Face hub id, "" to always estimate).
+Without one, DeepSeek models fetch theirs from the hub once, which is
+announced on stdout; Gemma and Gemini tokenizers are gated on the hub, so
+those families are estimated unless a local file is configured.
+"""
+import os
+import threading
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # Optional: without it every count is an estimate
+    Tokenizer = None
+
+MESSAGE_OVERHEAD = 4  # Role and separator tokens the chat template adds around each message
+
+# (substring of the model name, tokenizer to load by default, UTF-8 bytes per token for the estimate)
+FAMILIES = (
+    ("deepseek", "deepseek-ai/DeepSeek-V3", 3.8),
+    ("gemma", None, 4.2),  # google/gemma-3-* needs a hub token; point "tokenizer" at a local copy
+    ("gemini", None, 4.2),  # Gemma 3's tokenizer.json matches Gemini 2.0's vocabulary
+)
+DEFAULT_BYTES_PER_TOKEN = 4.0
+
+_counters = {}
+_lock = threading.Lock()
+
+
+class TokenCounter:
+    """Token counts for one model.
+
+    Counts are exact once the model's tokenizer has loaded (on a background
+    thread, from a local tokenizer.json or the Hugging Face hub). Until then,
+    or when the tokenizers package or the file is unavailable, they are
+    estimated from the UTF-8 length with a per-family ratio that is refined
+    from the usage numbers the API reports.
+    """
+
+    def __init__(self, name, source=None, bytes_per_token=DEFAULT_BYTES_PER_TOKEN):
+        self.name = name
+        self.bytes_per_token = bytes_per_token
+        self.tokenizer = None
+        if source and Tokenizer is not None:
+            threading.Thread(target=self._load, args=(source,), name="tokenizer-load", daemon=True).start()
+
+    @property
+    def exact(self):
+        return self.tokenizer is not None
+
+    @property
+    def key(self):
+        """Identifies how counts were made; cached counts are redone when it changes."""
+        return (self.name, self.exact)
+
+    def _load(self, source):
+        try:
+            if os.path.isfile(source):
+                tokenizer = Tokenizer.from_file(source)
+            else:
+                print(f"Loading the {source} tokenizer for {self.name} from the Hugging Face hub (downloaded on first use)")
+                tokenizer = Tokenizer.from_pretrained(source)
+        except Exception as e:
+            print(f"Tokenizer for {self.name} unavailable, estimating counts: {e}")
+            return
+        self.tokenizer = tokenizer
+
+    def count(self, text):
+        if not text:
+            return 0
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        return max(1, round(len(text.encode("utf-8")) / self.bytes_per_token))
+
+    def count_message(self, message):
+        """Tokens of one message, counted once and cached on it."""
+        key = self.key
+        if message.tokens is None or message.tokens[0] != key:
+            message.tokens = (key, self.count(message.content) + MESSAGE_OVERHEAD)
+        return message.tokens[1]
+
+    def calibrate(self, text, tokens):
+        """Move the estimate towards a token count reported by the API for text."""
+        size = len(text.encode("utf-8"))
+        if self.exact or tokens <= 0 or size < 200:
+            return  # Short replies are too noisy to learn from
+        self.bytes_per_token = 0.8 * self.bytes_per_token + 0.2 * (size / tokens)
+
+
+def counter_for(model):
+    """Shared TokenCounter for an available_models entry."""
+    name = model.get("name", "")
+    with _lock:
+        counter = _counters.get(name)
+        if counter is None:
+            lowered = name.lower()
+            source, ratio = None, DEFAULT_BYTES_PER_TOKEN
+            for family, family_source, family_ratio in FAMILIES:
+                if family in lowered:
+                    source, ratio = family_source, family_ratio
+                    break
+            source = model.get("tokenizer", source)  # Path, hub id, or "" to always estimate
+            counter = _counters[name] = TokenCounter(name, source, ratio)
+        return counter
+
+
+def cost(model, input_tokens, output_tokens):
+    """Price in USD of one request, from the entry's per-million-token pricing."""
+    pricing = model.get("pricing") or {}
+    return (input_tokens * pricing.get("input", 0) + output_tokens * pricing.get("output", 0)) / 1_000_000
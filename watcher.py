@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+
+from filetree import scan_directory
+
+
+class FolderWatcher:
+    """Polls the directories the file pane has listed and reports what changed.
+
+    Each poll stats only the watched directories (and the open file). A
+    directory whose mtime moved is listed again and diffed against the last
+    listing, so the work grows with the number of changes rather than the size
+    of the tree. Changes are queued for the Tk thread:
+
+        ("dir", node, added_nodes, removed_names, renamed {old: new})
+        ("file", path) when the open file changed on disk
+    """
+
+    def __init__(self, config, interval=1.0):
+        self.config = config
+        self.interval = interval
+        self.changes = queue.Queue()
+        self.dirs = {}  # path -> [node, mtime_ns, {name: inode}]
+        self.file_path = None
+        self.file_stamp = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+            self._thread.start()
+
+    def reset(self):
+        with self._lock:
+            self.dirs = {}
+
+    def watch(self, node):
+        """Start watching a directory node right after it has been scanned."""
+        with self._lock:
+            self.dirs[node.path] = [node, node.mtime, {child.name: child.inode for child in node.children}]
+
+    def watch_file(self, path):
+        self.file_path = path
+        self.file_stamp = self._stamp(path)
+
+    def _stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                watched = list(self.dirs.values())
+            for entry in watched:
+                self._check_dir(entry)
+            if self.file_path:
+                stamp = self._stamp(self.file_path)
+                if stamp != self.file_stamp:
+                    self.file_stamp = stamp
+                    self.changes.put(("file", self.file_path))
+
+    def _check_dir(self, entry):
+        node, mtime, names = entry
+        try:
+            current = os.stat(node.path).st_mtime_ns
+        except OSError:
+            return  # Gone; its parent's listing will report the removal
+        if current == mtime:
+            return
+        try:
+            children = scan_directory(node, self.config.file_exclude_globs, self.config.respect_gitignore)
+        except OSError:
+            return
+        listing = {child.name: child for child in children}
+        added = [child for name, child in listing.items() if name not in names]
+        removed = [name for name in names if name not in listing]
+
+        # Same inode under a new name is a rename, not a delete plus a create
+        renamed = {}
+        by_inode = {names[name]: name for name in removed if names[name]}
+        for child in list(added):
+            old_name = by_inode.get(child.inode)
+            if old_name is not None:
+                renamed[old_name] = child.name
+                added.remove(child)
+                removed.remove(old_name)
+
+        with self._lock:
+            entry[1] = current
+            entry[2] = {name: child.inode for name, child in listing.items()}
+            gone = [os.path.join(node.path, name) for name in removed + list(renamed)]
+            for path in list(self.dirs):
+                if any(path == old or path.startswith(old + os.sep) for old in gone):
+                    del self.dirs[path]
+        if added or removed or renamed:
+            self.changes.put(("dir", node, added, removed, renamed))